@@ -31,21 +31,50 @@ from threading import Event, RLock, current_thread
 
 import frappy.params
 from frappy.datatypes import get_datatype
-from frappy.errors import HardwareError, SECoPError, WrongTypeError, \
-    make_secop_error
+from frappy.errors import HardwareError, ProtocolError, SECoPError, \
+    WrongTypeError, make_secop_error
 from frappy.lib import mkthread
 from frappy.lib.asynconn import AsynConn, ConnectionClosed
+from frappy.protocol.binary import decode_payload
 from frappy.protocol.interface import decode_msg, encode_msg_frame
-from frappy.protocol.messages import COMMANDREQUEST, DESCRIPTIONREQUEST, \
-    ENABLEEVENTSREQUEST, ERRORPREFIX, EVENTREPLY, HEARTBEATREQUEST, \
-    IDENTPREFIX, IDENTREQUEST, READREPLY, READREQUEST, REQUEST2REPLY, \
-    WRITEREPLY, WRITEREQUEST
+from frappy.protocol.messages import BINARYHEADER, BINARYREQUEST, \
+    COMMANDREQUEST, DESCRIPTIONREQUEST, ENABLEEVENTSREQUEST, ERRORPREFIX, \
+    EVENTREPLY, HEARTBEATREQUEST, IDENTPREFIX, IDENTREQUEST, \
+    READMANYREQUEST, READREPLY, READREQUEST, REQUEST2REPLY, WRITEREPLY, \
+    WRITEREQUEST
 
 # replies to be handled for cache
 UPDATE_MESSAGES = {EVENTREPLY, READREPLY, WRITEREPLY, ERRORPREFIX + READREQUEST, ERRORPREFIX + EVENTREPLY}
 
 VERSIONFMT = re.compile(r'^[^,]*?ISSE[^,]*,SECoP,')
 
+# interning cache for datatypes, shared by all clients: map canonical datainfo -> datatype
+_datatype_cache = {}
+MAX_CACHED_DATATYPES = 10000
+
+
+def cached_datatype(datainfo, pname=''):
+    """get the datatype for datainfo
+
+    datatypes with the same datainfo are created only once and shared,
+    they must not be modified
+    """
+    key = json.dumps(datainfo, sort_keys=True)
+    if '"enum"' in key:
+        # the name of an enum is derived from pname
+        key = key, pname
+    datatype = _datatype_cache.get(key)
+    if datatype is None:
+        if len(_datatype_cache) >= MAX_CACHED_DATATYPES:
+            _datatype_cache.clear()
+        datatype = _datatype_cache[key] = get_datatype(datainfo, pname)
+    return datatype
+
+
+def description_digest(description):
+    """a hash of the description, for detecting changes"""
+    return hash(json.dumps(description, sort_keys=True))
+
 
 class UnregisterCallback(Exception):
     """raise in a callback to indicate it has to be unregistered
@@ -311,6 +340,8 @@ class SecopClient(ProxyClient):
     secop_version = ''
     descriptive_data = {}
     modules = {}
+    _digests = {}  # map module name -> digest of its description
+    _node_digest = None
     _last_error = None
     _update_error_count = 0
     _max_error_count = 10
@@ -389,6 +420,13 @@ class SecopClient(ProxyClient):
                     self._rxthread = mkthread(self.__rxthread)
                     self._txthread = mkthread(self.__txthread)
                     self.log.debug('connected to %s', self.uri)
+                    if self.binary_transfer:
+                        try:
+                            self.request(BINARYREQUEST)
+                        except SECoPError:
+                            # an older or not frappy server, or an interface without
+                            # binary transfer: continue without
+                            pass
                     # pylint: disable=unsubscriptable-object
                     self._init_descriptive_data(self.request(DESCRIPTIONREQUEST)[2])
                     self.nodename = self.properties.get('equipment_id', self.uri)
@@ -452,6 +490,8 @@ class SecopClient(ProxyClient):
                 noactivity = 0
                 try:
                     action, ident, data = decode_msg(reply)
+                    if action == BINARYHEADER:
+                        action, ident, data = self._read_binary(ident, data)
                     if ident == '.':
                         ident = None
                     if action in UPDATE_MESSAGES:
@@ -477,6 +517,8 @@ class SecopClient(ProxyClient):
                             self.updateValue(module, param, value, timestamp, readerror)
                             if action in (EVENTREPLY, ERRORPREFIX + EVENTREPLY):
                                 continue
+                except ConnectionClosed:
+                    raise
                 except Exception as e:
                     e.args = (f'error handling SECoP message {reply!r}: {e}',)
                     try:
@@ -524,6 +566,26 @@ class SecopClient(ProxyClient):
                 self.log.warning('%s disconnected', self.uri)
                 self._set_state(False, 'disconnected')
 
+    def _read_binary(self, ident, header):
+        """read the binary data and the message following a binary header
+
+        returns the decoded message, with the value taken from the binary data
+        any error is fatal, as the position in the stream is no longer known:
+        ConnectionClosed is raised, which leads to a reconnect
+        """
+        try:
+            payload = self.io.readbytes(header['size'], 10)
+            reply = self.io.readline(10)
+            self.log.debug('RX: %r', reply)
+            action, msgident, data = decode_msg(reply)
+            if msgident != ident:
+                raise ProtocolError(f'binary data for {ident} followed by a message for {msgident}')
+            data[0] = decode_payload(header['format'], payload)
+        except Exception as e:
+            self.log.error('error reading binary data for %s: %r', ident, e)
+            raise ConnectionClosed(f'error reading binary data for {ident}: {e}') from e
+        return action, ident, data
+
     def spawn_connect(self, connected_callback=None):
         """try to connect in background
 
@@ -602,29 +664,44 @@ class SecopClient(ProxyClient):
             pass
 
     def _init_descriptive_data(self, data):
-        """rebuild descriptive data"""
+        """rebuild descriptive data
+
+        the entries of modules with unchanged description are kept
+        """
+        modules = data['modules']
+        nodeprops = {k: v for k, v in data.items() if k != 'modules'}
+        digests = {modname: description_digest(moddescr) for modname, moddescr in modules.items()}
+        node_digest = description_digest(nodeprops)
         changed_modules = None
-        if json.dumps(data, sort_keys=True) != json.dumps(self.descriptive_data, sort_keys=True):
-            if self.descriptive_data:
-                changed_modules = set()
-                modules = data.get('modules', {})
-                for modname, moddesc in self.descriptive_data['modules'].items():
-                    if json.dumps(moddesc, sort_keys=True) != json.dumps(modules.get(modname), sort_keys=True):
-                        changed_modules.add(modname)
+        if self.descriptive_data and (node_digest != self._node_digest or digests != self._digests):
+            changed_modules = {modname for modname, digest in self._digests.items()
+                               if digests.get(modname) != digest}
+        previous = {modname: self.modules[modname] for modname, digest in self._digests.items()
+                    if digests.get(modname) == digest and modname in self.modules}
         self.descriptive_data = data
-        modules = data['modules']
+        self._digests = digests
+        self._node_digest = node_digest
         self.modules = {}
-        self.properties = {k: v for k, v in data.items() if k != 'modules'}
+        self.properties = nodeprops
         self.identifier = {}  # map (module, parameter) -> identifier
         self.internal = {}  # map identifier -> (module, parameter)
         for modname, moddescr in modules.items():
+            accessibles = moddescr['accessibles']
+            unchanged = previous.get(modname)
+            if unchanged:
+                for aname in accessibles:
+                    iname = self.internalize_name(aname)
+                    ident = f'{modname}:{aname}'
+                    self.identifier[modname, iname] = ident
+                    self.internal[ident] = modname, iname
+                self.modules[modname] = unchanged
+                continue
             #  separate accessibles into command and parameters
             parameters = {}
             commands = {}
-            accessibles = moddescr['accessibles']
             for aname, aentry in accessibles.items():
                 iname = self.internalize_name(aname)
-                datatype = get_datatype(aentry['datainfo'], iname)
+                datatype = cached_datatype(aentry['datainfo'], iname)
                 aentry = dict(aentry, datatype=datatype)
                 ident = f'{modname}:{aname}'
                 self.identifier[modname, iname] = ident
@@ -711,6 +788,34 @@ class SecopClient(ProxyClient):
             self.updateValue(module, parameter, None, time.time(), e)
         return self.cache.get((module, parameter), None)
 
+    def readParameters(self, params):
+        """forced read of several parameters with one request
+
+        :param params: a list of (module, parameter) tuples
+        :return: a list of cache items
+
+        falls back to single reads, if the server does not support
+        the _readmany request
+        """
+        params = list(params)
+        try:
+            reply = self.request(READMANYREQUEST, None, [self.identifier[p] for p in params])
+        except ProtocolError:
+            # an older server, not knowing the request
+            return [self.readParameter(*p) for p in params]
+        now = time.time()
+        for (module, param), (action, _, data) in zip(params, reply[2]):
+            if action.startswith(ERRORPREFIX):
+                timestamp = data[2].get('t', now)
+                readerror = make_secop_error(*data[0:2])
+                value = None
+            else:
+                timestamp = data[1].get('t', now)
+                value = data[0]
+                readerror = None
+            self.updateValue(module, param, value, min(now, timestamp), readerror)
+        return [self.cache.get(p, None) for p in params]
+
     def getParameter(self, module, parameter, trycache=False):
         if trycache:
             cached = self.cache.get((module, parameter), None)
@@ -771,6 +876,10 @@ class SecopClient(ProxyClient):
 
     PREDEFINED_NAMES = set(frappy.params.PREDEFINED_ACCESSIBLES)
     activate = True
+    # request blobs and numeric arrays as binary data (frappy extension).
+    # off by default, as the values in the replies of request() are then
+    # not JSON serializable any more (e.g. bytes)
+    binary_transfer = False
 
     def internalize_name(self, name):
         """how to create internal names"""
@@ -371,6 +371,7 @@ def watch(*args, **kwds):
 
 class Client(SecopClient):
     activate = True
+    binary_transfer = True
     secnodes = {}
     mininterval = 1
 
@@ -124,6 +124,26 @@ class DataType(HasProperties):
         """
         return self(value)
 
+    def sequence_converter(self):
+        """return a function converting a sequence of values to a tuple
+
+        called once when creating an ArrayOf, may be overridden by a
+        specialized, faster implementation
+        """
+        return lambda values: tuple(map(self, values))
+
+    def sequence_exporter(self):
+        """return a function exporting a sequence of values to a list"""
+        if type(self).export_value is DataType.export_value:
+            return list  # no reformatting needed
+        return lambda values: list(map(self.export_value, values))
+
+    def sequence_importer(self):
+        """return a function importing a sequence of values to a tuple"""
+        if type(self).import_value is DataType.import_value:
+            return self.sequence_converter()
+        return lambda values: tuple(map(self.import_value, values))
+
     def format_value(self, value, unit=True):
         """format a value of this type into a string
 
@@ -281,6 +301,32 @@ class FloatRange(HasUnit, DataType):
         """returns a python object fit for serialisation"""
         return float(value)
 
+    def sequence_converter(self):
+        generic = super().sequence_converter()
+        maxfloat = sys.float_info.max
+        inf = float('inf')
+
+        def convert(values):
+            if hasattr(values, 'dtype'):  # a numpy array
+                if values.ndim == 1 and values.dtype.kind in 'biuf':
+                    return tuple(values.astype(float).clip(-maxfloat, maxfloat).tolist())
+                return generic(values)
+            try:
+                result = tuple([v + 0.0 for v in values])  # do not accept strings here
+            except Exception:
+                # for lazy_number_validation and the error message
+                return generic(values)
+            if not set(map(type, result)) <= {float}:
+                # e.g. complex or numpy scalars: reject or convert one by one
+                return generic(values)
+            if inf in result or -inf in result:
+                return generic(result)  # clamp
+            return result
+        return convert
+
+    def sequence_exporter(self):
+        return lambda values: list(map(float, values))
+
     def format_value(self, value, unit=True):
         if unit is True:
             unit = self.unit
@@ -599,6 +645,8 @@ class BLOBType(DataType):
 
     def import_value(self, value):
         """returns a python object from serialisation"""
+        if isinstance(value, bytes):
+            return value  # received as binary data
         try:
             return b64decode(value)
         except Exception:
@@ -770,6 +818,10 @@ class ArrayOf(DataType):
         if maxlen is None:
             maxlen = minlen or 100
         self.members = members
+        # specialized functions for the elements
+        self._convert_members = members.sequence_converter()
+        self._export_members = members.sequence_exporter()
+        self._import_members = members.sequence_importer()
         self.set_properties(minlen=minlen, maxlen=maxlen)
 
     @property
@@ -821,7 +873,7 @@ class ArrayOf(DataType):
         """accepts any sequence, converts to tuple (immutable!)"""
         self.check_type(value)
         try:
-            return tuple(self.members(v) for v in value)
+            return self._convert_members(value)
         except Exception as e:
             errcls = RangeError if isinstance(e, RangeError) else WrongTypeError
             raise errcls(f'can not convert some array elements: {e!r}') from e
@@ -837,13 +889,15 @@ class ArrayOf(DataType):
             raise errcls(f'some array elements are invalid: {e!r}') from e
 
     def export_value(self, value):
-        """returns a python object fit for serialisation"""
-        self.check_type(value)
-        return [self.members.export_value(elem) for elem in value]
+        """returns a python object fit for serialisation
+
+        the value is not checked, as it was validated before
+        """
+        return self._export_members(value)
 
     def import_value(self, value):
         """returns a python object from serialisation"""
-        return tuple(self.members.import_value(elem) for elem in value)
+        return self._import_members(value)
 
     def format_value(self, value, unit=True):
         innerunit = False
@@ -873,6 +927,101 @@ class ArrayOf(DataType):
         self.members.set_main_unit(unit)
 
 
+_frozen_array_class = None
+
+
+def frozen_array_class():
+    """the class of the values of NumpyArrayOf, created on first use"""
+    global _frozen_array_class  # pylint: disable=global-statement
+    if _frozen_array_class is None:
+        import numpy  # pylint: disable=import-outside-toplevel
+
+        class FrozenArray(numpy.ndarray):
+            """a read-only array, compared as a whole like a tuple"""
+
+            def __eq__(self, other):
+                return numpy.array_equal(self, other)
+
+            def __ne__(self, other):
+                return not numpy.array_equal(self, other)
+
+            __hash__ = None
+
+        _frozen_array_class = FrozenArray
+    return _frozen_array_class
+
+
+class NumpyArrayOf(ArrayOf):
+    """array of numbers, with values stored as read-only numpy arrays
+
+    the members must be FloatRange or IntRange. the values are compared
+    as a whole (a == b returns a bool, like for tuples). on the wire, this
+    is the same as ArrayOf. needs numpy to be installed.
+    """
+
+    def __init__(self, members, minlen=0, maxlen=None):
+        import numpy  # pylint: disable=import-outside-toplevel
+        if not isinstance(members, (FloatRange, IntRange)):
+            raise ProgrammingError('NumpyArrayOf only works with FloatRange or IntRange members!')
+        super().__init__(members, minlen, maxlen)
+        self.numpy = numpy
+        self.dtype = numpy.float64 if isinstance(members, FloatRange) else numpy.int64
+        self.arrayclass = frozen_array_class()
+
+    def copy(self):
+        return NumpyArrayOf(self.members.copy(), self.minlen, self.maxlen)
+
+    def __repr__(self):
+        return f'NumpyArrayOf({repr(self.members)}, {self.minlen}, {self.maxlen})'
+
+    def __call__(self, value):
+        """accepts any sequence of numbers, converts to a read-only array"""
+        if isinstance(value, self.arrayclass) and value.dtype == self.dtype:
+            return value  # already converted
+        self.check_type(value)
+        numpy = self.numpy
+        arr = numpy.asarray(value)
+        if arr.ndim != 1 or arr.dtype.kind not in 'biuf':
+            raise WrongTypeError(f'can not convert {shortrepr(value)} to an array of numbers')
+        result = arr.astype(self.dtype)  # this is always a copy
+        if self.dtype is numpy.float64:
+            # map +/-infty to +/-max possible number
+            numpy.clip(result, -sys.float_info.max, sys.float_info.max, out=result)
+        elif arr.dtype.kind == 'f' and not numpy.array_equal(result, arr):
+            raise WrongTypeError('array elements should be ints')
+        result = result.view(self.arrayclass)
+        result.flags.writeable = False
+        return result
+
+    def validate(self, value, previous=None):
+        value = self(value)
+        members = self.members
+        if not value.size:
+            return value
+        numpy = self.numpy
+        if self.dtype is numpy.float64:
+            prec = numpy.maximum(abs(value) * members.relative_resolution, members.absolute_resolution)
+            if ((value < members.min - prec) | (value > members.max + prec)).any():
+                raise RangeError(f'some array elements are not between {members.min:g} and {members.max:g}')
+            if value.min() >= members.min and value.max() <= members.max:
+                return value
+            # silently clamp when outside by not more than prec
+            result = value.clip(members.min, members.max)
+            result.flags.writeable = False
+            return result
+        if value.min() < members.min or value.max() > members.max:
+            raise RangeError(f'some array elements are not between {members.min} and {members.max}')
+        return value
+
+    def export_value(self, value):
+        """returns a python object fit for serialisation"""
+        return value.tolist()
+
+    def import_value(self, value):
+        """returns a python object from serialisation"""
+        return self(value)
+
+
 class TupleOf(DataType):
     """data structure with fields of inhomogeneous type
 
@@ -970,6 +1119,7 @@ class StructOf(DataType):
         self.members = members
         if not members:
             raise ProgrammingError('Empty structs are not allowed!')
+        self._names = set(members)  # for check_type
         self.optional = list(members if optional is None else optional)
         for name, subtype in list(members.items()):
             if not isinstance(subtype, DataType):
@@ -981,6 +1131,17 @@ class StructOf(DataType):
                     'Only members of StructOf may be declared as optional!')
         self.default = dict((k, el.default) for k, el in members.items())
 
+    @property
+    def optional(self):
+        return self._optional_list
+
+    @optional.setter
+    def optional(self, value):
+        self._optional_list = value
+        # for check_type
+        self._optional = set(value)
+        self._mandatory = self._names - self._optional
+
     def copy(self):
         """DataType.copy does not work when members contain enums"""
         return StructOf(self.optional, **{k: v.copy() for k, v in self.members.items()})
@@ -1024,14 +1185,15 @@ class StructOf(DataType):
 
     def check_type(self, value, allow_optional=False):
         try:
-            superfluous = set(dict(value)) - set(self.members)
+            superfluous = set(dict(value)) - self._names
         except TypeError:
             raise WrongTypeError(f'{type(value).__name__} can not be converted a StructOf') from None
-        if superfluous - set(self.optional):
+        if superfluous - self._optional:
             raise WrongTypeError(f"struct contains superfluous members: {', '.join(superfluous)}")
-        missing = set(self.members) - set(value)
         if self.client or allow_optional:  # on the client side, allow optional elements always
-            missing -= set(self.optional)
+            missing = self._mandatory.difference(value)
+        else:
+            missing = self._names.difference(value)
         if missing:
             raise WrongTypeError(f"missing struct elements: {', '.join(missing)}")
 
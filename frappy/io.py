@@ -24,7 +24,6 @@ other future extensions of AsynConn
 """
 
 import re
-import threading
 import time
 
 from frappy.datatypes import ArrayOf, BLOBType, BoolType, FloatRange, \
@@ -33,6 +32,7 @@ from frappy.errors import CommunicationFailedError, ConfigError, \
     ProgrammingError, SilentCommunicationFailedError as SilentError
 from frappy.lib import generalConfig
 from frappy.lib.asynconn import AsynConn, ConnectionClosed
+from frappy.lib.prioritylock import PriorityLock, is_high_priority
 from frappy.modules import Attached, Command, Communicator, Module, \
     Parameter, Property
 
@@ -101,6 +101,53 @@ class HasIodev(HasIO):
         self.sendRecv = self.communicate
 
 
+class PushSource(Module):
+    """Mixin for modules receiving unsolicited data (pushes) from the hardware
+
+    a receiver thread calls :meth:`deliverPush` for each frame. the frame is
+    handled by the functions registered for its key. the slow polls of the
+    parameters updated by a function are suppressed as long as pushes
+    arrive, polling resumes after push_timeout without pushes.
+    """
+    push_timeout = Property('time without pushes after which slow polls are resumed',
+                            FloatRange(0, unit='s'), default=60)
+
+    _push_targets = None
+
+    def earlyInit(self):
+        super().earlyInit()
+        self._push_targets = {}
+
+    def registerPushTarget(self, key, module, func, pnames=None):
+        """register a function handling pushed frames
+
+        :param key: the key of the frames, e.g. a channel or parameter name
+        :param module: the module whose parameters are updated by func
+        :param func: a function called with the frame as argument
+        :param pnames: the names of the parameters updated by func, default: [key]
+        """
+        self._push_targets.setdefault(key, []).append((module, func, pnames or [key]))
+
+    def deliverPush(self, key, frame):
+        """to be called by the receiver thread for each pushed frame
+
+        :return: True when the frame was handled
+        """
+        targets = self._push_targets.get(key)
+        if not targets:
+            return False
+        push_until = time.time() + self.push_timeout
+        for module, func, pnames in targets:
+            try:
+                func(frame)
+            except Exception as e:
+                module.log.error('error handling pushed frame %r: %r', frame, e)
+            if module.pollInfo:
+                for pname in pnames:
+                    module.pollInfo.push_until[pname] = push_until
+        return True
+
+
 class IOBase(Communicator):
     """base of StringIO and BytesIO"""
     uri = Property("""uri for serial connection
@@ -116,6 +163,8 @@ class IOBase(Communicator):
     is_connected = Parameter('connection state', datatype=BoolType(), readonly=False, default=False,
                              update_unchanged='never')
     pollinterval = Parameter('reconnect interval', datatype=FloatRange(0), readonly=False, default=10)
+    max_rate = Property('max. number of communications per second (0: no limit)',
+                        datatype=FloatRange(0), default=0)
     #: a dict of default settings for a device, e.g. for a LakeShore 336:
     #:
     #: ``default_settings = {'port': 7777, 'baudrate': 57600, 'parity': 'O', 'bytesize': 7}``
@@ -128,11 +177,52 @@ class IOBase(Communicator):
     _last_error = None
     _lock = None
     _last_connect_attempt = 0
+    _budget = 0  # available communications, when max_rate is given
+    _budget_time = 0  # the time when _budget was calculated
 
     def earlyInit(self):
         super().earlyInit()
         self._reconnectCallbacks = {}
-        self._lock = threading.RLock()
+        # client requests are served before background polls
+        self._lock = PriorityLock()
+
+    def availableBudget(self, now):
+        """the number of communications allowed now, with max_rate given
+
+        the budget is refilled at max_rate, up to the number of communications
+        allowed within one second (but at least one)
+        """
+        return min(self._budget + (now - self._budget_time) * self.max_rate,
+                   max(1, self.max_rate))
+
+    def useBudget(self):
+        """wait until a communication is allowed by max_rate
+
+        to be called within self._lock before each communication.
+        client requests (high priority) do not wait, but use the budget,
+        which defers the next slow polls
+        """
+        if not self.max_rate:
+            return
+        now = time.time()
+        budget = self.availableBudget(now)
+        if budget < 1 and not is_high_priority():
+            time.sleep((1 - budget) / self.max_rate)
+            now = time.time()
+            budget = self.availableBudget(now)
+        self._budget = max(0, budget - 1)
+        self._budget_time = now
+
+    def slowPollDelay(self):
+        """the time a slow poll has to wait for respecting max_rate
+
+        slow polls are deferred while less than half of the budget is left,
+        keeping the rest for doPoll and client requests
+        """
+        if not self.max_rate:
+            return 0
+        needed = (max(1, self.max_rate) + 1) * 0.5
+        return max(0, (needed - self.availableBudget(time.time())) / self.max_rate)
 
     def connectStart(self):
         if not self.is_connected:
@@ -305,6 +395,7 @@ class StringIO(IOBase):
                 else:
                     cmds = [command]
                 garbage = None
+                self.useBudget()
                 try:
                     for cmd in cmds:
                         if self.wait_before:
@@ -463,6 +554,7 @@ class BytesIO(IOBase):
         try:
             with self._lock:
                 # read garbage and wait before send
+                self.useBudget()
                 try:
                     if self.wait_before:
                         time.sleep(self.wait_before)
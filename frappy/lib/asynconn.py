@@ -142,15 +142,21 @@ class AsynConn:
         """
         if timeout:
             end = time.time() + timeout
-        while len(self._rxbuffer) < nbytes:
+        # collect the chunks in a list, in order to avoid copying on every chunk
+        chunks = [self._rxbuffer]
+        size = len(self._rxbuffer)
+        while size < nbytes:
             data = self.recv()
             if not data:
+                if timeout and time.time() < end:
+                    continue
+                self._rxbuffer = b''.join(chunks)
                 if timeout:
-                    if time.time() < end:
-                        continue
                     raise TimeoutError(f'timeout in readbytes ({timeout:g} sec)')
                 return None
-            self._rxbuffer += data
+            chunks.append(data)
+            size += len(data)
+        self._rxbuffer = b''.join(chunks)
         line = self._rxbuffer[:nbytes]
         self._rxbuffer = self._rxbuffer[nbytes:]
         return line
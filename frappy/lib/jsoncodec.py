@@ -0,0 +1,119 @@
+# *****************************************************************************
+#
+# This program is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+# *****************************************************************************
+"""JSON codec for the SECoP wire path
+
+the fast libraries are used for decoding only. encoding is always done by
+the standard library: the alternatives use other separators, float formats
+and escaping of non-ascii characters, and the frames have to stay the same.
+
+for decoding, the fastest available library is used: orjson, ujson or
+json from the standard library. the text is passed straight to the fast
+library, and only a message it can not decode (e.g. NaN with orjson) or
+an integer overflow is left to the standard library, so the result is
+always the same.
+
+orjson converts integers beyond 64 bit silently to float (e.g. the limits
+of an IntRange beyond 64 bit), so messages with 19 digits or more in a row
+are not decoded by orjson. loads may be called with a key, usually
+(action, specifier) of the message: after such a message, the messages with
+the same key are decoded by the standard library right away, without
+scanning them first.
+
+use select_codec(name) to choose a codec explicitly.
+"""
+
+import json
+
+dumps = json.dumps
+
+# for detecting 19 digits in a row: translate all digits to '0'
+DIGITS_TO_ZERO = bytes.maketrans(b'123456789', b'000000000')
+LONG_DIGITS = b'0' * 19
+
+# the keys of messages which had to be decoded by the standard library
+exact_keys = set()
+
+
+def _make_loads(fastloads):
+    def loads(text, key=None):
+        try:
+            return fastloads(text)
+        except (ValueError, OverflowError):
+            return json.loads(text)
+    return loads
+
+
+def _orjson():
+    import orjson  # pylint: disable=import-outside-toplevel
+
+    def loads(text, key=None):
+        if key in exact_keys:
+            return json.loads(text)
+        data = text.encode('utf-8')
+        if LONG_DIGITS in data.translate(DIGITS_TO_ZERO):
+            if key is not None:
+                exact_keys.add(key)
+            return json.loads(text)
+        try:
+            return orjson.loads(data)
+        except ValueError:
+            return json.loads(text)
+    return loads
+
+
+def _ujson():
+    import ujson  # pylint: disable=import-outside-toplevel
+    return _make_loads(ujson.loads)
+
+
+def _json():
+    def loads(text, key=None):
+        return json.loads(text)
+    return loads
+
+
+CODECS = {
+    'orjson': _orjson,
+    'ujson': _ujson,
+    'json': _json,
+}
+
+codec = None  # the name of the selected codec
+loads = json.loads
+
+
+def select_codec(name=None):
+    """select the codec for decoding
+
+    :param name: one of the keys of CODECS, or None for the fastest available
+    :return: the name of the selected codec
+    """
+    global codec, loads  # pylint: disable=global-statement
+    for cname in [name] if name else CODECS:
+        try:
+            loads = CODECS[cname]()
+            codec = cname
+            exact_keys.clear()
+            return codec
+        except ImportError:
+            if name:
+                raise
+    return codec  # not reached, as 'json' is always available
+
+
+select_codec()
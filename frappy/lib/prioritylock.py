@@ -0,0 +1,98 @@
+# *****************************************************************************
+#
+# This program is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+# *****************************************************************************
+"""a reentrant lock serving high priority threads first
+
+the dispatcher handles client requests with high priority, so that they
+do not have to wait behind background polls on the lock of an io.
+"""
+
+import threading
+from contextlib import contextmanager
+
+_local = threading.local()
+
+
+@contextmanager
+def high_priority():
+    """context for code with high priority, e.g. handling a client request"""
+    previous = getattr(_local, 'high', False)
+    _local.high = True
+    try:
+        yield
+    finally:
+        _local.high = previous
+
+
+def is_high_priority():
+    return getattr(_local, 'high', False)
+
+
+class PriorityLock:
+    """a reentrant lock, waiting threads with high priority are served first
+
+    may be used in place of threading.RLock
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._owner = None
+        self._count = 0
+        self._waiting_high = 0  # number of waiting threads with high priority
+
+    def acquire(self, blocking=True, timeout=-1):
+        me = threading.get_ident()
+        high = is_high_priority()
+        with self._cond:
+            if self._owner == me:
+                self._count += 1
+                return True
+
+            def free():
+                return self._owner is None and (high or not self._waiting_high)
+
+            if not blocking:
+                result = free()
+            else:
+                if high:
+                    self._waiting_high += 1
+                try:
+                    result = self._cond.wait_for(free, None if timeout < 0 else timeout)
+                finally:
+                    if high:
+                        self._waiting_high -= 1
+                if not result and not self._waiting_high:
+                    # low priority threads may be waiting for the last high priority one
+                    self._cond.notify_all()
+            if result:
+                self._owner = me
+                self._count = 1
+            return result
+
+    def release(self):
+        with self._cond:
+            if self._owner != threading.get_ident():
+                raise RuntimeError('cannot release un-acquired lock')
+            self._count -= 1
+            if not self._count:
+                self._owner = None
+                self._cond.notify_all()
+
+    __enter__ = acquire
+
+    def __exit__(self, *args):
+        self.release()
@@ -34,6 +34,7 @@ from frappy.errors import BadValueError, CommunicationFailedError, ConfigError,
     ProgrammingError, SECoPError, secop_error, RangeError
 from frappy.lib import formatException, mkthread, UniqueObject
 from frappy.params import Accessible, Command, Parameter, Limit, PREDEFINED_ACCESSIBLES
+from frappy.poller import Poller
 from frappy.properties import HasProperties, Property
 from frappy.logging import RemoteLogHandler
 
@@ -245,31 +246,6 @@ class Feature(HasAccessibles):
     """
 
 
-class PollInfo:
-    def __init__(self, pollinterval, trigger_event):
-        self.interval = pollinterval
-        self.last_main = 0
-        self.last_slow = 0
-        self.pending_errors = set()
-        self.polled_parameters = []
-        self.fast_flag = False
-        self.trigger_event = trigger_event
-
-    def trigger(self, immediate=False):
-        """trigger a recalculation of poll due times
-
-        :param immediate: when True, doPoll should be called as soon as possible
-        """
-        if immediate:
-            self.last_main = 0
-        self.trigger_event.set()
-
-    def update_interval(self, pollinterval):
-        if not self.fast_flag:
-            self.interval = pollinterval
-            self.trigger()
-
-
 class Module(HasAccessibles):
     """basic module
 
@@ -317,12 +293,15 @@ class Module(HasAccessibles):
     features = Property('list of features', ArrayOf(StringType()), extname='features')
     pollinterval = Property('poll interval for parameters handled by doPoll', FloatRange(0.1, 120), default=5)
     slowinterval = Property('poll interval for other parameters', FloatRange(0.1, 120), default=15)
+    max_pollinterval = Property('max. poll interval for adaptive polling (0: off)',
+                                FloatRange(0, 120), default=0)
     omit_unchanged_within = Property('default for minimum time between updates of unchanged values',
                                      NoneOr(FloatRange(0)), export=False, default=None)
     enablePoll = True
 
     pollInfo = None
     triggerPoll = None  # trigger event for polls. used on io modules and modules without io
+    startupDuration = None  # time needed for writeInitParams, initialReads and first polls
 
     def __init__(self, name, logger, cfgdict, srv):
         # remember the secnode for interacting with other modules and the
@@ -511,32 +490,34 @@ class Module(HasAccessibles):
         when err=None and validate=False, the value must already be converted to the datatype
         """
 
+        pobj = self.parameters[pname]
+        # the conversion does not need the lock. the stored value is already
+        # converted (and immutable), so announcing it again needs no conversion
+        if validate and not err and (value is None or value is not pobj.value):
+            try:
+                value = pobj.datatype(value)
+            except Exception as e:
+                err = e
+        timestamp = timestamp or time.time()
         with self.updateLock:
-            pobj = self.parameters[pname]
-            timestamp = timestamp or time.time()
-            changed = False
-            if not err:
-                try:
-                    if validate:
-                        value = pobj.datatype(value)
-                except Exception as e:
-                    err = e
-                else:
-                    changed = pobj.value != value or pobj.readerror
-                    # store the value even in case of error
-                    pobj.value = value
             if err:
-                if secop_error(err) == pobj.readerror:
+                secoperr = secop_error(err)
+                if secoperr == pobj.readerror:
                     err.report_error = False
                     return  # no updates for repeated errors
-                err = secop_error(err)
+                err = secoperr
                 value_err = value, err
             else:
+                # compare by identity first, as comparing large values is expensive
+                oldvalue = pobj.value
+                changed = pobj.readerror is not None or (value is not oldvalue and oldvalue != value)
+                # store the value even in case of error
+                pobj.value = value
                 if not changed and timestamp < (pobj.timestamp or 0) + pobj.omit_unchanged_within:
                     # no change within short time -> omit
                     return
                 value_err = (value,)
-            pobj.timestamp = timestamp or time.time()
+            pobj.timestamp = timestamp
             pobj.readerror = err
             for cbfunc, cbargs in self.paramCallbacks[pname]:
                 try:
@@ -607,7 +588,12 @@ class Module(HasAccessibles):
         # we do not need self.errors any longer. should we delete it?
         # del self.errors
         if self.polledModules:
-            mkthread(self.__pollThread, self.polledModules, start_events.get_trigger())
+            pool = getattr(self.secNode, 'pollPool', None)
+            if pool and self.polledModules == [self]:
+                # not sharing an io with other modules
+                pool.add_module(self, start_events.get_trigger())
+            else:
+                mkthread(self.__pollThread, self.polledModules, start_events.get_trigger())
         self.startModuleDone = True
 
     def initialReads(self):
@@ -644,14 +630,20 @@ class Module(HasAccessibles):
             self.pollInfo.interval = fast_interval if flag else self.pollinterval
             self.pollInfo.trigger()
 
-    def callPollFunc(self, rfunc, raise_com_failed=False):
-        """call read method with proper error handling"""
+    def callPollFunc(self, rfunc, raise_com_failed=False, due=None):
+        """call read method with proper error handling
+
+        :param due: the time the call was due, for the poll statistics
+        """
+        start = time.time()
+        error = False
         try:
             rfunc()
             if rfunc.__name__ in self.pollInfo.pending_errors:
                 self.log.info('%s: o.k.', rfunc.__name__)
                 self.pollInfo.pending_errors.discard(rfunc.__name__)
         except Exception as e:
+            error = True
             if getattr(e, 'report_error', True):
                 name = rfunc.__name__
                 self.pollInfo.pending_errors.add(name)  # trigger o.k. message after error is resolved
@@ -667,6 +659,9 @@ class Module(HasAccessibles):
                     # not a SECoPError: this is proabably a programming error
                     # we want to log the traceback
                     self.log.error('%s', formatException())
+        finally:
+            self.pollInfo.add_stats(rfunc.__name__, time.time() - start,
+                                    None if due is None else start - due, error)
 
     def __pollThread(self, modules, started_callback):
         """poll thread body
@@ -676,96 +671,7 @@ class Module(HasAccessibles):
 
         before polling, parameters which need hardware initialisation are written
         """
-        polled_modules = [m for m in modules if m.enablePoll]
-        if hasattr(self, 'registerReconnectCallback'):
-            # self is a communicator supporting reconnections
-            def trigger_all(trg=self.triggerPoll, polled_modules=polled_modules):
-                for m in polled_modules:
-                    m.pollInfo.last_main = 0
-                    m.pollInfo.last_slow = 0
-                trg.set()
-            self.registerReconnectCallback('trigger_polls', trigger_all)
-
-        # collect all read functions
-        for mobj in polled_modules:
-            pinfo = mobj.pollInfo = PollInfo(mobj.pollinterval, self.triggerPoll)
-            # trigger a poll interval change when self.pollinterval changes.
-            if 'pollinterval' in mobj.paramCallbacks:
-                mobj.addCallback('pollinterval', pinfo.update_interval)
-
-            for pname, pobj in mobj.parameters.items():
-                rfunc = getattr(mobj, 'read_' + pname)
-                if rfunc.poll:
-                    pinfo.polled_parameters.append((mobj, rfunc, pobj))
-        while True:
-            try:
-                for mobj in modules:
-                    # TODO when needed: here we might add a call to a method :meth:`beforeWriteInit`
-                    mobj.writeInitParams()
-                    mobj.initialReads()
-                # call all read functions a first time
-                for m in polled_modules:
-                    for mobj, rfunc, _ in m.pollInfo.polled_parameters:
-                        mobj.callPollFunc(rfunc, raise_com_failed=True)
-                # TODO when needed: here we might add calls to a method :meth:`afterInitPolls`
-                break
-            except CommunicationFailedError as e:
-                # when communication failed, probably all parameters and may be more modules are affected.
-                # as this would take a lot of time (summed up timeouts), we do not continue
-                # trying and let the server accept connections, further polls might success later
-                if started_callback:
-                    self.log.error('communication failure on startup: %s', e)
-                    started_callback()
-                    started_callback = None
-            self.triggerPoll.wait(0.1)  # wait for reconnection or max 10 sec.
-            break
-        if started_callback:
-            started_callback()
-        if not polled_modules:  # no polls needed - exit thread
-            return
-        to_poll = ()
-        while True:
-            now = time.time()
-            wait_time = 999
-            for mobj in modules:
-                pinfo = mobj.pollInfo
-                wait_time = min(pinfo.last_main + pinfo.interval - now, wait_time,
-                                pinfo.last_slow + mobj.slowinterval - now)
-            if wait_time > 0 and not to_poll:
-                # nothing to do
-                self.triggerPoll.wait(wait_time)
-                self.triggerPoll.clear()
-                continue
-            # call doPoll of all modules where due
-            for mobj in modules:
-                pinfo = mobj.pollInfo
-                if now > pinfo.last_main + pinfo.interval:
-                    try:
-                        pinfo.last_main = (now // pinfo.interval) * pinfo.interval
-                    except ZeroDivisionError:
-                        pinfo.last_main = now
-                    mobj.callPollFunc(mobj.doPoll)
-                now = time.time()
-            # find ONE due slow poll and call it
-            loop = True
-            while loop:  # loops max. 2 times, when to_poll is at end
-                for mobj, rfunc, pobj in to_poll:
-                    if now > pobj.timestamp + mobj.slowinterval * 0.5:
-                        mobj.callPollFunc(rfunc)
-                        loop = False  # one poll done
-                        break
-                else:
-                    to_poll = []
-                    # collect due slow polls
-                    for mobj in modules:
-                        pinfo = mobj.pollInfo
-                        if now > pinfo.last_slow + mobj.slowinterval:
-                            to_poll.extend(pinfo.polled_parameters)
-                            pinfo.last_slow = (now // mobj.slowinterval) * mobj.slowinterval
-                    if to_poll:
-                        to_poll = iter(to_poll)
-                    else:
-                        loop = False  # no slow polls ready
+        Poller(self, modules).run(started_callback)
 
     def writeInitParams(self):
         """write values for parameters with configured values
@@ -0,0 +1,730 @@
+# *****************************************************************************
+#
+# This program is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+# *****************************************************************************
+"""polling of modules
+
+the modules of an io are polled by a thread started by the io, other
+modules by a thread of their own, or, when the node option 'poll_workers'
+is given, by a pool of worker threads. when the node option 'startup_limit'
+is given, the number of ios on the same host starting at the same time
+is limited. the node option 'poll_deadline' enables a watchdog for poll
+functions not returning in time.
+
+the due times of the polls are kept in priority queues, so finding the
+next due poll does not need a scan over all modules and parameters
+"""
+
+import heapq
+import math
+import queue
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from itertools import count
+
+from frappy.errors import CommunicationFailedError, TimeoutSECoPError
+from frappy.lib import mkthread
+
+
+class PollInfo:
+    def __init__(self, pollinterval, trigger_event):
+        self.interval = pollinterval
+        self.last_main = 0
+        self.last_slow = 0
+        self.pending_errors = set()
+        self.polled_parameters = []
+        self.fast_flag = False
+        self.trigger_event = trigger_event
+        self.max_interval = 0  # > 0: adaptive polling
+        self.last_values = None  # for adaptive polling
+        self.stats = {}  # <name of poll function> -> PollStats
+        self.load = None  # PollLoad, shared by the modules of a poll thread
+        self.push_until = {}  # <parameter name> -> slow poll suppressed until this time, see PushSource
+        self.backoff = {}  # <name of poll function> -> skip calls until this time
+        # the following attributes are handled by the PollScheduler
+        self.module = None
+        self.changed = None  # set of triggered pollInfos
+        self.main_gen = 0
+        self.slow_gen = 0
+        self.due = {}  # <name of poll function> -> <due time>
+
+    def trigger(self, immediate=False):
+        """trigger a recalculation of poll due times
+
+        :param immediate: when True, doPoll should be called as soon as possible
+        """
+        if immediate:
+            self.last_main = 0
+        if self.changed is not None:
+            self.changed.add(self)
+        self.trigger_event.set()
+
+    def update_interval(self, pollinterval):
+        if not self.fast_flag:
+            self.interval = pollinterval
+            self.trigger()
+
+    def add_stats(self, name, duration, lateness, error):
+        """add the result of a poll function call to the statistics"""
+        stats = self.stats.get(name)
+        if stats is None:
+            stats = self.stats[name] = PollStats()
+        stats.add(duration, lateness, error)
+        if self.load:
+            self.load.busy += duration
+
+    def adapt(self, mobj):
+        """adapt the interval of doPoll, when adaptive polling is enabled
+
+        to be called after doPoll. the interval is doubled, up to max_interval,
+        when value and status did not change since the last call. it is reset
+        to the poll interval when they change, or while the module is busy.
+        changes of the value within the resolution of the datatype are ignored
+        """
+        if not self.max_interval or self.fast_flag:
+            return
+        values = [mobj.parameters[p] for p in ('value', 'status') if p in mobj.parameters]
+        values = [(pobj.datatype, pobj.value) for pobj in values]
+        last_values, self.last_values = self.last_values, values
+        if last_values is None:
+            return
+        if mobj.isBusy() or any(significant_change(dt, old, new)
+                                for (dt, old), (_, new) in zip(last_values, values)):
+            self.interval = mobj.pollinterval
+        else:
+            self.interval = min(self.interval * 2, max(self.max_interval, mobj.pollinterval))
+
+
+class PollStats:
+    """statistics of the calls of one poll function
+
+    count and errors are counted since startup, the other values are
+    calculated from the last WINDOW calls
+    """
+    WINDOW = 100
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.durations = deque(maxlen=self.WINDOW)
+        self.lateness = deque(maxlen=self.WINDOW)
+
+    def add(self, duration, lateness, error):
+        """add a call
+
+        :param duration: the duration of the call
+        :param lateness: the delay of the call compared to the due time, or None
+        :param error: True when the call raised an error
+        """
+        self.count += 1
+        self.errors += bool(error)
+        self.durations.append(duration)
+        if lateness is not None:
+            self.lateness.append(max(0, lateness))
+
+    def summary(self):
+        """return the statistics as a dict"""
+        durations = sorted(self.durations)
+        lateness = list(self.lateness)
+        result = {'count': self.count, 'errors': self.errors}
+        if durations:
+            result.update(mean=sum(durations) / len(durations),
+                          p95=durations[math.ceil(0.95 * len(durations)) - 1],
+                          max=durations[-1])
+        if lateness:
+            result.update(mean_lateness=sum(lateness) / len(lateness),
+                          max_lateness=max(lateness))
+        return result
+
+
+class PollLoad:
+    """the time consumed by the polls of one poll thread"""
+
+    def __init__(self, name):
+        self.name = name  # the name of the io, or of the module without io
+        self.busy = 0
+        self.since = time.time()
+
+    def fraction(self):
+        """the fraction of time spent in poll functions"""
+        elapsed = time.time() - self.since
+        return self.busy / elapsed if elapsed > 0 else 0
+
+
+def significant_change(datatype, old, new):
+    """check if a value changed by more than the resolution of the datatype"""
+    try:
+        prec = max(abs(new * datatype.relative_resolution), datatype.absolute_resolution)
+        return abs(new - old) > prec
+    except (AttributeError, TypeError):
+        # not a number type
+        return new != old
+
+
+class PollScheduler:
+    """due times of the polls of a set of modules
+
+    there are two priority queues: one with an entry per module for doPoll
+    and one with an entry per polled parameter for the slow polls.
+
+    doPoll is due every pollInfo.interval, aligned to multiples of the interval.
+    slow polls are due every slowinterval, the phases of the parameters of a
+    module being spread over the interval (see schedule_slow), except when
+    the polls are read in bulk. a slow poll is skipped when the parameter
+    was updated within the last half slowinterval.
+
+    changes of the poll interval or triggered polls have to be registered by
+    calling pollInfo.trigger(). the queues are updated lazily: an entry with
+    an outdated generation number is dropped when popped.
+
+    the due times are available for diagnostics in pollInfo.due, a dict
+    <name of poll function> -> <due time>
+    """
+
+    def __init__(self, spread=True):
+        self.spread = spread  # False: the slow polls of a module are due at the same time
+        self.main = []  # heap of [due, seq, gen, mobj]
+        self.slow = []  # heap of [due, seq, gen, mobj, rfunc, pobj]
+        self.changed = set()  # pollInfos triggered since the last call to update
+        self.seq = count()  # tie breaker, keeping the insertion order
+
+    def add_module(self, mobj, now):
+        pinfo = mobj.pollInfo
+        pinfo.module = mobj
+        pinfo.changed = self.changed
+        self.push_main(mobj, now)
+        self.schedule_slow(mobj, now, spread=self.spread)
+
+    def push_main(self, mobj, now):
+        """(re)schedule doPoll of mobj"""
+        pinfo = mobj.pollInfo
+        pinfo.main_gen += 1
+        due = pinfo.last_main + pinfo.interval
+        # a triggered doPoll is due now, not at last_main + interval
+        pinfo.due['doPoll'] = max(due, now)
+        heapq.heappush(self.main, [due, next(self.seq), pinfo.main_gen, mobj])
+
+    def schedule_slow(self, mobj, now, spread):
+        """(re)schedule all slow polls of mobj
+
+        :param spread: True: spread the polls over slowinterval, False: all due now
+
+        for spreading, the slowinterval is divided into slots of about the
+        poll interval, aligned with the doPoll calls, and the parameters are
+        distributed evenly over the slots
+        """
+        pinfo = mobj.pollInfo
+        pinfo.slow_gen += 1
+        pinfo.last_slow = now
+        polled = pinfo.polled_parameters
+        nslots = 1
+        slot = 0
+        if spread and polled and pinfo.interval > 0:
+            nslots = max(1, round(mobj.slowinterval / pinfo.interval))
+            slot = mobj.slowinterval / nslots
+            now = (now // slot) * slot
+        for i, (_, rfunc, pobj) in enumerate(polled):
+            due = now + (i * nslots // len(polled)) * slot
+            pinfo.due[rfunc.__name__] = due
+            heapq.heappush(self.slow, [due, next(self.seq), pinfo.slow_gen, mobj, rfunc, pobj])
+
+    def update(self, now):
+        """apply the changes registered by pollInfo.trigger()
+
+        pollInfo.last_slow == 0 indicates that all slow polls are due
+        """
+        while self.changed:
+            pinfo = self.changed.pop()
+            self.push_main(pinfo.module, now)
+            if not pinfo.last_slow:
+                self.schedule_slow(pinfo.module, now, spread=False)
+
+    def pop_main(self, now):
+        """remove and return a module with a due doPoll, or None
+
+        the caller must call push_main after calling doPoll
+        """
+        main = self.main
+        while main and main[0][0] <= now:
+            _, _, gen, mobj = heapq.heappop(main)
+            pinfo = mobj.pollInfo
+            if gen != pinfo.main_gen:
+                continue  # outdated
+            if pinfo.last_main + pinfo.interval > now:
+                # the interval was increased in the meantime
+                self.push_main(mobj, now)
+                continue
+            return mobj
+        return None
+
+    def pop_slow(self, now):
+        """return (mobj, rfunc, due) of the next due slow poll, or None
+
+        the poll is rescheduled already. parameters updated recently are skipped,
+        and parameters while their values are pushed
+        """
+        slow = self.slow
+        while slow and slow[0][0] <= now:
+            entry = heapq.heappop(slow)
+            due, _, gen, mobj, rfunc, _ = entry
+            if gen != mobj.pollInfo.slow_gen:
+                continue  # outdated
+            needed = self._reschedule(entry, now)
+            heapq.heappush(slow, entry)
+            if needed:
+                return mobj, rfunc, due
+        return None
+
+    def pop_slow_all(self, now):
+        """return (mobj, rfunc) of all due slow polls
+
+        the polls are rescheduled already, like in pop_slow
+        """
+        result = []
+        modified = False  # the entries have to be heapified again
+        for entry in self.slow:
+            if entry[0] <= now:
+                modified = True
+                if entry[2] != entry[3].pollInfo.slow_gen:
+                    continue  # outdated, removed below
+                if self._reschedule(entry, now):
+                    result.append((entry[3], entry[4]))
+        if modified:
+            self.slow[:] = [e for e in self.slow if e[2] == e[3].pollInfo.slow_gen]
+            heapq.heapify(self.slow)
+        return result
+
+    def _reschedule(self, entry, now):
+        """set the next due time of a slow poll entry
+
+        :return: whether the poll is needed
+        """
+        due, _, _, mobj, rfunc, pobj = entry
+        pinfo = mobj.pollInfo
+        interval = mobj.slowinterval
+        nextdue = due + interval
+        if nextdue <= now:
+            # we are late: do not try to catch up, but keep the phase
+            nextdue += ((now - nextdue) // interval + 1) * interval
+        entry[0:2] = nextdue, next(self.seq)
+        pinfo.due[rfunc.__name__] = nextdue
+        return now > pobj.timestamp + interval * 0.5 and now > pinfo.push_until.get(pobj.name, 0)
+
+    def next_due(self, slow_after=0):
+        """the time when the next poll is due or None
+
+        :param slow_after: slow polls are deferred until this time
+        """
+        return min((q[0][0] if q is self.main else max(q[0][0], slow_after)
+                    for q in (self.main, self.slow) if q), default=None)
+
+
+class Poller:
+    """polls a list of modules sequentially
+
+    :param owner: the module owning the trigger event, an io or a module without io
+    :param modules: the modules to be handled
+
+    before polling, parameters which need hardware initialisation are written
+    """
+
+    def __init__(self, owner, modules):
+        self.owner = owner
+        self.modules = modules
+        self.polled_modules = [m for m in modules if m.enablePoll]
+        # the owner (usually an io) may read the due slow polls of all its modules in one go
+        self.bulk = getattr(owner, 'bulkRead', None)
+        self.scheduler = PollScheduler(spread=not self.bulk)
+        secnode = getattr(owner, 'secNode', None)
+        self.watchdog = getattr(secnode, 'pollWatchdog', None)
+        self.limiter = getattr(secnode, 'startupLimiter', None)
+        # an io with max_rate is defering slow polls
+        self.slow_poll_delay = getattr(owner, 'slowPollDelay', lambda: 0)
+
+    def setup(self, started_callback):
+        """initialise and call all read functions a first time
+
+        :param started_callback: to be called after all polls are done once
+        :return: True when polling is needed
+        """
+        owner = self.owner
+        polled_modules = self.polled_modules
+        if hasattr(owner, 'registerReconnectCallback'):
+            # owner is a communicator supporting reconnections
+            def trigger_all(polled_modules=polled_modules):
+                for m in polled_modules:
+                    m.pollInfo.last_slow = 0
+                    m.pollInfo.trigger(True)
+            owner.registerReconnectCallback('trigger_polls', trigger_all)
+
+        # collect all read functions
+        load = PollLoad(owner.name)
+        for mobj in polled_modules:
+            pinfo = mobj.pollInfo = PollInfo(mobj.pollinterval, owner.triggerPoll)
+            pinfo.max_interval = mobj.max_pollinterval
+            pinfo.load = load
+            # trigger a poll interval change when self.pollinterval changes.
+            if 'pollinterval' in mobj.paramCallbacks:
+                mobj.addCallback('pollinterval', pinfo.update_interval)
+
+            for pname, pobj in mobj.parameters.items():
+                rfunc = getattr(mobj, 'read_' + pname)
+                if rfunc.poll:
+                    pinfo.polled_parameters.append((mobj, rfunc, pobj))
+        durations = {m: 0 for m in self.modules}
+        limiter = self.limiter
+        with limiter.slot(owner) if limiter else nullcontext():
+            while True:
+                try:
+                    for mobj in self.modules:
+                        t = time.time()
+                        try:
+                            # TODO when needed: here we might add a call to a method :meth:`beforeWriteInit`
+                            mobj.writeInitParams()
+                            mobj.initialReads()
+                        finally:
+                            durations[mobj] += time.time() - t
+                    # call all read functions a first time
+                    for m in polled_modules:
+                        for mobj, rfunc, _ in m.pollInfo.polled_parameters:
+                            t = time.time()
+                            try:
+                                self.call(mobj, rfunc, raise_com_failed=True)
+                            finally:
+                                durations[mobj] += time.time() - t
+                    # TODO when needed: here we might add calls to a method :meth:`afterInitPolls`
+                    break
+                except CommunicationFailedError as e:
+                    # when communication failed, probably all parameters and may be more modules are affected.
+                    # as this would take a lot of time (summed up timeouts), we do not continue
+                    # trying and let the server accept connections, further polls might success later
+                    if started_callback:
+                        owner.log.error('communication failure on startup: %s', e)
+                        started_callback()
+                        started_callback = None
+                owner.triggerPoll.wait(0.1)  # wait for reconnection or max 10 sec.
+                break
+        for mobj, duration in durations.items():
+            mobj.startupDuration = duration
+        if started_callback:
+            started_callback()
+        if not polled_modules:  # no polls needed
+            return False
+        now = time.time()
+        for mobj in polled_modules:
+            self.scheduler.add_module(mobj, now)
+        return True
+
+    def poll(self):
+        """call all due doPoll and ONE due slow poll
+
+        :return: the time when the next poll is due
+        """
+        scheduler = self.scheduler
+        now = time.time()
+        scheduler.update(now)
+        # call doPoll of all modules where due
+        polled = []
+        while True:
+            mobj = scheduler.pop_main(now)
+            if mobj is None:
+                break
+            pinfo = mobj.pollInfo
+            due = pinfo.due['doPoll']
+            try:
+                pinfo.last_main = (now // pinfo.interval) * pinfo.interval
+            except ZeroDivisionError:
+                pinfo.last_main = now
+            if now >= pinfo.backoff.get('doPoll', 0):
+                self.call(mobj, mobj.doPoll, due=due)
+                pinfo.adapt(mobj)
+            polled.append(mobj)
+            now = time.time()
+        # reschedule after the loop, calling doPoll max. once per module
+        for mobj in polled:
+            scheduler.push_main(mobj, now)
+        # call ONE due slow poll, unless deferred by the rate limit of the io
+        delay = self.slow_poll_delay()
+        if delay:
+            return scheduler.next_due(now + delay)
+        slowpoll = scheduler.pop_slow(now)
+        if slowpoll:
+            mobj, rfunc, due = slowpoll
+            if self.bulk:
+                # read all due slow polls of the modules of the owner in one go
+                self.bulk_read([(mobj, rfunc)] + scheduler.pop_slow_all(now), due)
+            elif now >= mobj.pollInfo.backoff.get(rfunc.__name__, 0):
+                self.call(mobj, rfunc, due=due)
+        return scheduler.next_due()
+
+    def bulk_read(self, polls, due):
+        """read parameters with owner.bulkRead
+
+        :param polls: a list of (mobj, rfunc) of due slow polls
+
+        parameters not returned by bulkRead are read by their read functions.
+        the call of bulkRead is accounted to the module of the first poll
+        """
+        mobj = polls[0][0]
+        if time.time() < mobj.pollInfo.backoff.get('bulkRead', 0):
+            return
+        requests = [(m, rfunc.__name__[5:]) for m, rfunc in polls]  # strip 'read_'
+        result = {}
+        failed = []
+
+        def bulkRead():
+            try:
+                result.update(self.bulk(requests))
+            except Exception as e:
+                failed.append(e)
+                for m, pname in requests:
+                    m.announceUpdate(pname, err=e)
+                raise
+
+        self.call(mobj, bulkRead, due=due)
+        if failed:
+            return
+        for (m, pname), (_, rfunc) in zip(requests, polls):
+            if (m, pname) in result:
+                m.announceUpdate(pname, result[m, pname])
+            else:
+                self.call(m, rfunc, due=due)
+
+    def call(self, mobj, rfunc, **kwds):
+        """call a poll function, watched by the watchdog, if any"""
+        if self.watchdog:
+            with self.watchdog.watch(mobj, rfunc):
+                mobj.callPollFunc(rfunc, **kwds)
+        else:
+            mobj.callPollFunc(rfunc, **kwds)
+
+    def run(self, started_callback):
+        """poll thread body"""
+        if not self.setup(started_callback):
+            return  # no polls needed - exit thread
+        trigger = self.owner.triggerPoll
+        while True:
+            wait_time = min(self.poll() - time.time(), 999)
+            if wait_time > 0:
+                # nothing to do
+                trigger.wait(wait_time)
+                trigger.clear()
+
+
+def gateway_host(uri):
+    """the host of a tcp uri or None"""
+    scheme, _, address = uri.rpartition('://')
+    if scheme in ('', 'tcp') and address:
+        return address.rsplit(':', 1)[0]
+    return None
+
+
+class StartupLimiter:
+    """limits the number of ios on the same host starting at the same time
+
+    ios on the same host, e.g. a network-serial gateway, are started with
+    at most nmax in parallel. others, including modules without io, are
+    started without limitation.
+    """
+
+    def __init__(self, nmax):
+        self.nmax = nmax
+        self.lock = threading.Lock()
+        self.semaphores = {}  # host -> semaphore
+
+    def slot(self, owner):
+        """a context manager, waiting for a free slot"""
+        host = gateway_host(getattr(owner, 'uri', None) or '')
+        if host is None:
+            return nullcontext()
+        with self.lock:
+            semaphore = self.semaphores.get(host)
+            if semaphore is None:
+                semaphore = self.semaphores[host] = threading.BoundedSemaphore(self.nmax)
+            return semaphore
+
+
+def affected_parameters(mobj, rfunc):
+    """the names of the parameters updated by a poll function"""
+    if rfunc.__name__ == 'doPoll':
+        return [p for p in ('value', 'status') if p in mobj.parameters]
+    pname = rfunc.__name__[5:]  # strip 'read_'
+    return [pname] if pname in mobj.parameters else []
+
+
+class PollWatchdog:
+    """detects poll functions not returning within a deadline
+
+    a stuck call is logged with the stack of its thread, and the parameters
+    updated by the function get a timeout readerror. when backoff is given,
+    the function is skipped for this time after it finally returned, so that
+    other modules polled by the same thread keep their update rate.
+    """
+
+    def __init__(self, deadline, backoff, log):
+        self.deadline = deadline
+        self.backoff = backoff
+        self.log = log
+        self.lock = threading.Lock()
+        self.running = {}  # thread ident -> [mobj, rfunc, start, stuck]
+        mkthread(self._run)
+
+    @contextmanager
+    def watch(self, mobj, rfunc):
+        """context for watching a call of rfunc"""
+        ident = threading.get_ident()
+        call = [mobj, rfunc, time.time(), False]
+        with self.lock:
+            self.running[ident] = call
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.running.pop(ident, None)
+            if call[3]:  # was stuck
+                now = time.time()
+                mobj.log.warning('%s returned after %.3g s', rfunc.__name__, now - call[2])
+                if self.backoff:
+                    mobj.pollInfo.backoff[rfunc.__name__] = now + self.backoff
+
+    def _run(self):
+        while True:
+            time.sleep(self.deadline * 0.25)
+            now = time.time()
+            with self.lock:
+                stuck = [(ident, call) for ident, call in self.running.items()
+                         if not call[3] and now > call[2] + self.deadline]
+                for _, call in stuck:
+                    call[3] = True
+            for ident, (mobj, rfunc, start, _) in stuck:
+                self.report(ident, mobj, rfunc, start)
+
+    def report(self, ident, mobj, rfunc, start):
+        """log the stack of a stuck call and set the readerrors"""
+        frame = sys._current_frames().get(ident)  # pylint: disable=protected-access
+        stack = ''.join(traceback.format_stack(frame)) if frame else ''
+        mobj.log.error('%s is stuck since %.3g s\n%s', rfunc.__name__, time.time() - start, stack)
+        err = TimeoutSECoPError(f'{rfunc.__name__} did not return within {self.deadline:g} s')
+        for pname in affected_parameters(mobj, rfunc):
+            try:
+                mobj.announceUpdate(pname, err=err)
+            except Exception as e:
+                self.log.error('can not set readerror of %s.%s: %r', mobj.name, pname, e)
+
+
+class PoolTrigger(threading.Event):
+    """the trigger event of a module polled by a PollPool"""
+
+    def __init__(self, pool, poller):
+        super().__init__()
+        self.pool = pool
+        self.poller = poller
+
+    def set(self):
+        super().set()
+        self.pool.trigger(self.poller)
+
+
+class PollPool:
+    """a fixed number of worker threads, polling modules without io
+
+    a module is handed to one worker at a time, so its polls are still
+    sequential. one scheduler thread hands the modules to the workers,
+    when their next poll is due.
+    """
+
+    def __init__(self, nworkers, log):
+        self.log = log
+        self.heap = []  # heap of [due, seq, gen, poller]
+        self.seq = count()  # tie breaker
+        self.cond = threading.Condition()
+        self.jobs = queue.Queue()  # (poller, started_callback)
+        self.state = {}  # poller -> [gen, busy, triggered]
+        mkthread(self._scheduler)
+        for _ in range(nworkers):
+            mkthread(self._worker)
+
+    def add_module(self, mobj, started_callback):
+        """add a module to the pool
+
+        setup and polling are done by the workers
+        """
+        poller = Poller(mobj, [mobj])
+        mobj.triggerPoll = PoolTrigger(self, poller)
+        with self.cond:
+            self.state[poller] = [0, True, False]
+        self.jobs.put((poller, started_callback))
+
+    def trigger(self, poller):
+        """poll as soon as possible"""
+        with self.cond:
+            state = self.state.get(poller)
+            if state is None:
+                return
+            if state[1]:  # busy
+                state[2] = True
+            else:
+                self._push(poller, 0)
+
+    def _push(self, poller, due):
+        state = self.state[poller]
+        state[0] += 1
+        state[1] = state[2] = False
+        heapq.heappush(self.heap, [due, next(self.seq), state[0], poller])
+        self.cond.notify()
+
+    def _scheduler(self):
+        heap = self.heap
+        with self.cond:
+            while True:
+                if heap:
+                    wait_time = heap[0][0] - time.time()
+                    if wait_time > 0:
+                        self.cond.wait(min(wait_time, 999))
+                        continue
+                    _, _, gen, poller = heapq.heappop(heap)
+                    state = self.state[poller]
+                    if gen == state[0]:
+                        state[1] = True  # busy
+                        self.jobs.put((poller, None))
+                else:
+                    self.cond.wait()
+
+    def _worker(self):
+        while True:
+            poller, started_callback = self.jobs.get()
+            try:
+                if started_callback:
+                    if not poller.setup(started_callback):
+                        with self.cond:
+                            self.state.pop(poller)
+                        continue
+                    due = 0
+                else:
+                    poller.owner.triggerPoll.clear()
+                    due = poller.poll()
+            except Exception:
+                # polling of this module is stopped, as it would be with a poll thread
+                self.log.exception('error in poller of %s', poller.owner.name)
+                with self.cond:
+                    self.state.pop(poller)
+                continue
+            with self.cond:
+                self._push(poller, 0 if self.state[poller][2] else due)
@@ -82,6 +82,7 @@ class Property:
 
     def __set__(self, instance, value):
         instance.propertyValues[self.name] = self.datatype.validate(value)
+        HasProperties.propertyChanges += 1
 
     def __set_name__(self, owner, name):
         self.name = name
@@ -115,6 +116,8 @@ class HasProperties(HasDescriptors):
     - include also attributes of type Property on base classes not inheriting HasProperties
     """
     propertyValues = None
+    # incremented on any property change, used for invalidating the cached description
+    propertyChanges = 0
 
     def __init__(self):
         super().__init__()
@@ -189,3 +192,4 @@ class HasProperties(HasDescriptors):
         # in oder to extend setting to inner properties
         # otherwise direct setting of self.<key> = value is preferred
         self.propertyValues[key] = self.propertyDict[key].datatype.validate(value)
+        HasProperties.propertyChanges += 1
@@ -0,0 +1,94 @@
+# *****************************************************************************
+#
+# This program is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+# *****************************************************************************
+"""binary transfer of blobs and numeric arrays
+
+a frappy specific extension of the protocol: after a client sent the request
+'_binary', the values of blobs and of numeric arrays with at least MIN_ITEMS
+elements are not sent base64 or json encoded. such a message is preceded by
+the header
+
+    _bin <specifier> {"format": <format>, "size": <nbytes>}
+
+followed by <nbytes> of binary data. the message follows with null in place
+of the value. on websockets, the binary data is sent as a binary frame.
+
+formats: 'blob' (the bytes as they are), 'f8' and 'i8' (64 bit floats and
+integers, little endian)
+"""
+
+import sys
+from array import array
+
+from frappy.datatypes import ArrayOf, BLOBType, FloatRange, IntRange
+
+# map format -> typecode for array
+FORMATS = {'blob': None, 'f8': 'd', 'i8': 'q'}
+# smaller arrays are sent as json
+MIN_ITEMS = 16
+INT64_MIN = -(1 << 63)
+INT64_MAX = (1 << 63) - 1
+
+
+def binary_format(datatype):
+    """return the format for sending values of datatype as binary data
+
+    or None, when values of this datatype are always sent as json
+    """
+    if isinstance(datatype, BLOBType):
+        return 'blob'
+    if isinstance(datatype, ArrayOf):
+        members = datatype.members
+        if isinstance(members, FloatRange):
+            return 'f8'
+        if isinstance(members, IntRange) and INT64_MIN <= members.min and members.max <= INT64_MAX:
+            return 'i8'
+    return None
+
+
+def encode_payload(fmt, value):
+    """encode a value (internal representation) to binary data
+
+    returns None for arrays too small for binary transfer
+    """
+    if fmt == 'blob':
+        return value
+    if len(value) < MIN_ITEMS:
+        return None
+    if hasattr(value, 'dtype'):  # a numpy array
+        return value.astype('<' + fmt, copy=False).tobytes()
+    data = array(FORMATS[fmt], value)
+    if sys.byteorder == 'big':
+        data.byteswap()
+    return data.tobytes()
+
+
+def decode_payload(fmt, payload):
+    """decode binary data to the exported representation of the value
+
+    i.e. the value as it would be decoded from json, but bytes for blobs
+    """
+    if fmt == 'blob':
+        return bytes(payload)
+    try:
+        data = array(FORMATS[fmt])
+    except KeyError:
+        raise ValueError(f'unknown binary format {fmt!r}') from None
+    data.frombytes(payload)
+    if sys.byteorder == 'big':
+        data.byteswap()
+    return data.tolist()
@@ -40,7 +40,7 @@ class UDPListener:
         self.description = description or ''
         self.firmware = 'FRAPPY ' + get_version()
         self.ports = [int(iface.split('://')[1])
-                      for iface in ifaces if iface.startswith('tcp')]
+                      for iface in ifaces if iface.startswith(('tcp', 'asyncio'))]
         self.running = False
         self.is_enabled = True
         self.startup_broadcast = startup_broadcast
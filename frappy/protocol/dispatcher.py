@@ -29,29 +29,76 @@ Interface to the service offering part:
    on the connectionobj or on activated connections
  - 'add_connection(connectionobj)' registers new connection
  - 'remove_connection(connectionobj)' removes now longer functional connection
+ - 'send_to(connectionobj, msg)' sends a message to a connection, via its
+   output queue, if configured
+
+Options (given as keywords in the Node section of the cfg file):
+
+ - outqueue_size: when > 0, messages are sent from a writer thread per
+   connection, with an output queue of the given size
+ - outqueue_overflow: what to do when an output queue is full:
+   'coalesce' (default), 'disconnect' or 'block'. see OutputQueue
+ - request_locking: 'node' (default): only one request at a time,
+   'module': read, change and do requests (and the reads of a _readmany request)
+   are serialized per module only,
+   'io': as 'module', but modules sharing an io are serialized together
+
+Connections may request binary transfer of blobs and numeric arrays with the
+frappy specific request '_binary', see frappy.protocol.binary
 """
 
 import threading
+from contextlib import nullcontext
 from time import time as currenttime
 
-from frappy.errors import NoSuchCommandError, NoSuchModuleError, \
-    NoSuchParameterError, ProtocolError, ReadOnlyError
+from frappy.errors import ConfigError, NoSuchCommandError, \
+    NoSuchModuleError, NoSuchParameterError, ProtocolError, ReadOnlyError, \
+    secop_error
+from frappy.lib.prioritylock import high_priority
 from frappy.params import Parameter
-from frappy.protocol.messages import COMMANDREPLY, DESCRIPTIONREPLY, \
-    DISABLEEVENTSREPLY, ENABLEEVENTSREPLY, ERRORPREFIX, EVENTREPLY, \
-    HEARTBEATREPLY, IDENTREPLY, IDENTREQUEST, LOG_EVENT, LOGGING_REPLY, \
-    READREPLY, WRITEREPLY
+from frappy.protocol.binary import FORMATS, binary_format
+from frappy.protocol.interface import EncodedMessage
+from frappy.protocol.outqueue import OVERFLOW_POLICIES, OutputQueue
+from frappy.protocol.messages import BINARYREPLY, COMMANDREPLY, \
+    COMMANDREQUEST, DESCRIPTIONREPLY, DISABLEEVENTSREPLY, ENABLEEVENTSREPLY, \
+    ERRORPREFIX, EVENTREPLY, HEARTBEATREPLY, IDENTREPLY, IDENTREQUEST, \
+    LOG_EVENT, LOGGING_REPLY, POLLSTATSREPLY, READMANYREPLY, READMANYREQUEST, \
+    READREPLY, READREQUEST, WRITEREPLY, WRITEREQUEST
+
+# requests which may be handled concurrently for different modules
+# _readmany locks the modules one by one, see handle__readmany
+MODULE_REQUESTS = {READREQUEST, WRITEREQUEST, COMMANDREQUEST, READMANYREQUEST}
+REQUEST_LOCKING = ('node', 'module', 'io')
+
+
+def make_value_message(action, specifier, pobj):
+    """create a message with the value of a parameter
+
+    for values which may be sent as binary data, the internal value is attached
+    """
+    msg = EncodedMessage(
+        action, specifier,
+        [pobj.export_value(),
+         {'t': pobj.timestamp} if pobj.timestamp else {}])
+    fmt = binary_format(pobj.datatype)
+    if fmt:
+        msg.binary = fmt, pobj.value
+    return msg
 
 
 def make_update(modulename, pobj):
+    """create an update message
+
+    the returned message caches its encoded frame, so it is encoded only once,
+    even when sent to several connections
+    """
     if pobj.readerror:
-        return (ERRORPREFIX + EVENTREPLY, f'{modulename}:{pobj.export}',
-                # error-report !
-                [pobj.readerror.name, str(pobj.readerror),
-                 {'t': pobj.timestamp} if pobj.timestamp else {}])
-    return (EVENTREPLY, f'{modulename}:{pobj.export}',
-            [pobj.export_value(),
+        return EncodedMessage(
+            ERRORPREFIX + EVENTREPLY, f'{modulename}:{pobj.export}',
+            # error-report !
+            [pobj.readerror.name, str(pobj.readerror),
              {'t': pobj.timestamp} if pobj.timestamp else {}])
+    return make_value_message(EVENTREPLY, f'{modulename}:{pobj.export}', pobj)
 
 
 class Dispatcher:
@@ -66,7 +113,28 @@ class Dispatcher:
         # map eventname -> list of subscribed connections
         # eventname is <modulename> or <modulename>:<parametername>
         self._subscriptions = {}
+        # routing table: map (<modulename>, <parametername>) -> tuple of
+        # connections, for parameters with specific subscriptions.
+        # for all other parameters, the listeners are self._all_listeners.
+        # the dict is replaced on changes, not modified in place, so it might
+        # be used without locking
+        self._routes = {}
+        self._all_listeners = ()
+        self._routes_lock = threading.RLock()
         self._lock = threading.RLock()
+        # map connection -> OutputQueue
+        self._outqueues = {}
+        self.outqueue_size = options.pop('outqueue_size', 0)
+        self.outqueue_overflow = options.pop('outqueue_overflow', 'coalesce')
+        if self.outqueue_overflow not in OVERFLOW_POLICIES:
+            raise ConfigError(f'outqueue_overflow must be one of {OVERFLOW_POLICIES}')
+        self.request_locking = options.pop('request_locking', 'node')
+        if self.request_locking not in REQUEST_LOCKING:
+            raise ConfigError(f'request_locking must be one of {REQUEST_LOCKING}')
+        # map module or io name -> lock for module requests
+        self._request_locks = {}
+        # map specifier -> cached describe reply, caching also the encoded frame
+        self._describe_replies = {}
         self.name = name
         self.restart = srv.restart
         self.shutdown = srv.shutdown
@@ -77,38 +145,97 @@ class Dispatcher:
         """broadcasts a msg to all active connections
 
         used from the dispatcher"""
+        if not isinstance(msg, EncodedMessage):
+            # encode only once for all listeners
+            msg = EncodedMessage(*msg)
         if reallyall:
             listeners = self._connections
         else:
-            # all subscribers to module:param
-            listeners = self._subscriptions.get(msg[1], set()).copy()
-            # all subscribers to module
-            module = msg[1].split(':', 1)[0]
-            listeners.update(self._subscriptions.get(module, set()))
-            # all generic subscribers
-            listeners.update(self._active_connections)
+            modulename, _, pname = msg[1].partition(':')
+            listeners = self._routes.get((modulename, pname), self._all_listeners)
         for conn in listeners:
+            self.send_to(conn, msg)
+
+    def send_to(self, conn, msg):
+        """send a message to a connection
+
+        via its output queue, if configured, else directly
+        """
+        outqueue = self._outqueues.get(conn)
+        if outqueue is None:
             conn.send_reply(msg)
+        else:
+            outqueue.put(msg)
 
     def announce_update(self, moduleobj, pobj):
         """called by modules param setters to notify subscribers of new values
         """
-        self.broadcast_event(make_update(moduleobj.name, pobj))
+        msg = make_update(moduleobj.name, pobj)
+        for conn in self._routes.get((moduleobj.name, pobj.export), self._all_listeners):
+            self.send_to(conn, msg)
+
+    def _update_routes(self, modulename=None):
+        """update the routing table
+
+        :param modulename: the module with changed subscriptions,
+            None when the active connections have changed
+        """
+        with self._routes_lock:
+            if modulename is None:
+                self._all_listeners = tuple(self._active_connections)
+                modulenames = {m for m, _ in self._routes}
+                modulenames.update(k.partition(':')[0] for k, v in self._subscriptions.items() if v)
+                routes = {}
+            else:
+                modulenames = [modulename]
+                routes = {k: v for k, v in self._routes.items() if k[0] != modulename}
+            for modname in modulenames:
+                module_subscribers = self._subscriptions.get(modname, set())
+                pnames = {k.partition(':')[2] for k, v in self._subscriptions.items()
+                          if v and k.startswith(f'{modname}:')}
+                if module_subscribers:
+                    moduleobj = self.secnode.modules.get(modname)
+                    if moduleobj:
+                        pnames.update(p.export for p in moduleobj.parameters.values() if p.export)
+                for pname in pnames:
+                    listeners = self._subscriptions.get(f'{modname}:{pname}', set()).union(
+                        module_subscribers, self._active_connections)
+                    routes[modname, pname] = tuple(listeners)
+            self._routes = routes
 
     def subscribe(self, conn, eventname):
-        self._subscriptions.setdefault(eventname, set()).add(conn)
+        with self._routes_lock:
+            self._subscriptions.setdefault(eventname, set()).add(conn)
+            self._update_routes(eventname.partition(':')[0])
 
     def unsubscribe(self, conn, eventname):
-        if ':' not in eventname:
-            # also remove 'more specific' subscriptions
-            for k, v in self._subscriptions.items():
-                if k.startswith(f'{eventname}:'):
-                    v.discard(conn)
-        if eventname in self._subscriptions:
-            self._subscriptions[eventname].discard(conn)
+        with self._routes_lock:
+            if ':' not in eventname:
+                # also remove 'more specific' subscriptions
+                for k, v in self._subscriptions.items():
+                    if k.startswith(f'{eventname}:'):
+                        v.discard(conn)
+            if eventname in self._subscriptions:
+                self._subscriptions[eventname].discard(conn)
+            self._update_routes(eventname.partition(':')[0])
+
+    def activate_all(self, conn):
+        """subscribe conn to all events"""
+        with self._routes_lock:
+            self._active_connections.add(conn)
+            self._update_routes()
+
+    def deactivate_all(self, conn):
+        """remove conn from the connections subscribed to all events"""
+        with self._routes_lock:
+            self._active_connections.discard(conn)
+            self._update_routes()
 
     def add_connection(self, conn):
         """registers new connection"""
+        if self.outqueue_size > 0:
+            self._outqueues[conn] = OutputQueue(
+                conn, self.outqueue_size, self.outqueue_overflow, self.log)
         self._connections.append(conn)
 
     def reset_connection(self, conn):
@@ -116,16 +243,33 @@ class Dispatcher:
 
         to be called on the identification message
         """
-        for _evt, conns in list(self._subscriptions.items()):
-            conns.discard(conn)
+        with self._routes_lock:
+            for _evt, conns in list(self._subscriptions.items()):
+                conns.discard(conn)
+            self._active_connections.discard(conn)
+            self._update_routes()
         self.set_all_log_levels(conn, 'off')
-        self._active_connections.discard(conn)
+        # binary transfer has to be requested again
+        conn.binary = ()
 
     def remove_connection(self, conn):
         """removes now longer functional connection"""
         if conn in self._connections:
             self._connections.remove(conn)
         self.reset_connection(conn)
+        outqueue = self._outqueues.pop(conn, None)
+        if outqueue:
+            outqueue.close()
+            stats = outqueue.statistics()
+            if any(stats.values()):
+                self.log.info('output queue statistics of closed connection: %r', stats)
+
+    def outqueue_statistics(self):
+        """return the output queue counters for all connections
+
+        :return: a list of tuples (connection, dict of counters)
+        """
+        return [(conn, outqueue.statistics()) for conn, outqueue in list(self._outqueues.items())]
 
     def _execute_command(self, modulename, exportedname, argument=None):
         """ Execute a command. Importing the value is done in 'do' for nicer
@@ -166,7 +310,7 @@ class Dispatcher:
         # note: exceptions are handled in handle_request, not here!
         getattr(moduleobj, 'write_' + pname)(value)
         # return value is ignored here, as already handled
-        return pobj.export_value(), {'t': pobj.timestamp} if pobj.timestamp else {}
+        return pobj
 
     def _getParameterValue(self, modulename, exportedname):
         moduleobj = self.secnode.get_module(modulename)
@@ -185,7 +329,33 @@ class Dispatcher:
         # note: exceptions are handled in handle_request, not here!
         getattr(moduleobj, 'read_' + pname)()
         # return value is ignored here, as already handled
-        return pobj.export_value(), {'t': pobj.timestamp} if pobj.timestamp else {}
+        return pobj
+
+    def _request_lock(self, action, specifier):
+        """get the lock to be held while handling a request
+
+        depending on self.request_locking, this is the dispatcher lock, or
+        for module requests, a lock per module or per io
+        """
+        if self.request_locking == 'node' or action not in MODULE_REQUESTS:
+            return self._lock
+        if action == READMANYREQUEST:
+            return nullcontext()  # the modules are locked one by one
+        if not specifier:
+            return self._lock
+        modulename = specifier.partition(':')[0]
+        moduleobj = self.secnode.modules.get(modulename)
+        if moduleobj is None:
+            # an error will be raised later
+            return self._lock
+        if self.request_locking == 'io':
+            io = getattr(moduleobj, 'io', None)
+            if io is not None:
+                modulename = io.name
+        lock = self._request_locks.get(modulename)
+        if lock is None:
+            lock = self._request_locks.setdefault(modulename, threading.RLock())
+        return lock
 
     #
     # api to be called from the 'interface'
@@ -200,8 +370,10 @@ class Dispatcher:
         self.log.debug('Dispatcher: handling msg: %s', repr(msg))
 
         # play thread safe !
-        # XXX: ONLY ONE REQUEST (per dispatcher) AT A TIME
-        with self._lock:
+        # with request_locking == 'node': ONLY ONE REQUEST (per dispatcher) AT A TIME
+        # else module requests are serialized per module or io
+        # high priority: waiting on the lock of an io, the request goes before polls
+        with self._request_lock(msg[0], msg[1]), high_priority():
             action, specifier, data = msg
             # special case for *IDN?
             if action == IDENTREQUEST:
@@ -226,7 +398,13 @@ class Dispatcher:
         return (IDENTREPLY, None, None)
 
     def handle_describe(self, conn, specifier, data):
-        return (DESCRIPTIONREPLY, specifier or '.', self.secnode.get_descriptive_data(specifier))
+        description = self.secnode.get_descriptive_data(specifier)
+        reply = self._describe_replies.get(specifier)
+        # the cached reply is valid as long as the description is the same object
+        if reply is None or reply[2] is not description:
+            reply = EncodedMessage(DESCRIPTIONREPLY, specifier or '.', description)
+            self._describe_replies[specifier] = reply
+        return reply
 
     def handle_read(self, conn, specifier, data):
         if data:
@@ -237,7 +415,71 @@ class Dispatcher:
         if ':' in specifier:
             modulename, pname = specifier.split(':', 1)
         # XXX: trigger polling and force sending event ???
-        return (READREPLY, specifier, list(self._getParameterValue(modulename, pname)))
+        result = self._getParameterValue(modulename, pname)
+        if isinstance(result, Parameter):
+            return make_value_message(READREPLY, specifier, result)
+        return (READREPLY, specifier, list(result))  # a constant
+
+    def handle__readmany(self, conn, specifier, data):
+        """read several parameters with one request
+
+        data is a list of specifiers. the reply contains a list with an entry
+        [action, specifier, data] for each of them, as it would be the reply
+        to a single read request. update events are sent as for single reads
+        """
+        if not isinstance(data, list) or not all(isinstance(s, str) for s in data):
+            raise ProtocolError('_readmany requests need a list of specifiers!')
+        result = []
+        for spec in data:
+            try:
+                # with request_locking != 'node', lock the module being read
+                with self._request_lock(READREQUEST, spec):
+                    result.append(list(self.handle_read(conn, spec, None)))
+            except Exception as e:
+                e = secop_error(e)
+                result.append([ERRORPREFIX + READREQUEST, spec, [e.name, str(e), {}]])
+        return (READMANYREPLY, specifier, result)
+
+    def handle__pollstats(self, conn, specifier, data):
+        """get the poll statistics of one or all modules
+
+        the reply contains the statistics per poll function of the modules,
+        and the fraction of time the poll threads (i.e. of an io) are busy
+        """
+        if specifier:
+            moduleobj = self.secnode.modules.get(specifier)
+            if moduleobj is None:
+                raise NoSuchModuleError(f'Module {specifier!r} does not exist')
+            modules = [moduleobj]
+        else:
+            modules = self.secnode.modules.values()
+        result = {}
+        pollers = {}
+        for moduleobj in modules:
+            pinfo = moduleobj.pollInfo
+            if pinfo is None:
+                continue
+            result[moduleobj.name] = {k: v.summary() for k, v in list(pinfo.stats.items())}
+            load = pinfo.load
+            if load:
+                poller = pollers.setdefault(load.name, {'load': load.fraction(), 'modules': []})
+                poller['modules'].append(moduleobj.name)
+        return (POLLSTATSREPLY, specifier, {'modules': result, 'pollers': pollers})
+
+    def handle__binary(self, conn, specifier, data):
+        """request binary transfer of blobs and numeric arrays
+
+        data is an optional list of the requested formats. the reply contains
+        the formats which will be sent as binary data
+        """
+        if not getattr(conn, 'supports_binary', False):
+            raise ProtocolError('binary transfer is not supported on this interface')
+        if data is None:
+            data = list(FORMATS)
+        elif not isinstance(data, list):
+            raise ProtocolError('_binary requests need a list of formats!')
+        conn.binary = tuple(f for f in FORMATS if f in data)
+        return (BINARYREPLY, specifier, list(conn.binary))
 
     def handle_change(self, conn, specifier, data):
         if not specifier:
@@ -245,7 +487,8 @@ class Dispatcher:
         modulename, pname = specifier, 'target'
         if ':' in specifier:
             modulename, pname = specifier.split(':', 1)
-        return (WRITEREPLY, specifier, list(self._setParameterValue(modulename, pname, data)))
+        pobj = self._setParameterValue(modulename, pname, data)
+        return make_value_message(WRITEREPLY, specifier, pobj)
 
     def handle_do(self, conn, specifier, data):
         if not specifier:
@@ -280,7 +523,7 @@ class Dispatcher:
             self.subscribe(conn, specifier)
         else:
             # activate all modules
-            self._active_connections.add(conn)
+            self.activate_all(conn)
             modules = [(m, None) for m in self.secnode.export]
 
         # send updates for all subscribed values.
@@ -288,11 +531,11 @@ class Dispatcher:
         for modulename, pname in modules:
             moduleobj = self.secnode.modules.get(modulename, None)
             if pname:
-                conn.send_reply(make_update(modulename, moduleobj.parameters[pname]))
+                self.send_to(conn, make_update(modulename, moduleobj.parameters[pname]))
                 continue
             for pobj in moduleobj.accessibles.values():
                 if isinstance(pobj, Parameter) and pobj.export:
-                    conn.send_reply(make_update(modulename, pobj))
+                    self.send_to(conn, make_update(modulename, pobj))
         return (ENABLEEVENTSREPLY, specifier, None) if specifier else (ENABLEEVENTSREPLY, None, None)
 
     def handle_deactivate(self, conn, specifier, data):
@@ -301,13 +544,13 @@ class Dispatcher:
         if specifier:
             self.unsubscribe(conn, specifier)
         else:
-            self._active_connections.discard(conn)
+            self.deactivate_all(conn)
             # XXX: also check all entries in self._subscriptions?
         return (DISABLEEVENTSREPLY, None, None)
 
     def send_log_msg(self, conn, modname, level, msg):
         """send log message """
-        conn.send_reply((LOG_EVENT, f'{modname}:{level}', msg))
+        self.send_to(conn, (LOG_EVENT, f'{modname}:{level}', msg))
 
     def set_all_log_levels(self, conn, level):
         for modobj in self.secnode.modules.values():
@@ -20,7 +20,9 @@
 #
 # *****************************************************************************
 
-import json
+from frappy.lib import jsoncodec
+from frappy.protocol.binary import encode_payload
+from frappy.protocol.messages import BINARYHEADER
 
 EOL = b'\n'
 
@@ -30,22 +32,102 @@ def encode_msg_frame(action, specifier=None, data=None):
 
     action (and optional specifier) are str strings,
     data may be an json-yfied python object"""
-    msg = (action, specifier or '', '' if data is None else json.dumps(data))
+    msg = (action, specifier or '', '' if data is None else jsoncodec.dumps(data))
     return ' '.join(msg).strip().encode('utf-8') + EOL
 
 
-def get_msg(_bytes):
-    """try to deframe the next msg in (binary) input
-    always return a tuple (msg, remaining_input)
-    msg may also be None
+class EncodedMessage(tuple):
+    """a msg_triple caching its encoded frame
+
+    used for messages sent to several connections (e.g. update events),
+    where encoding should happen once only, and not for every connection.
+    behaves like the plain (action, specifier, data) tuple otherwise
+
+    for messages with a value which may be sent as binary data, the attribute
+    binary is set to (format, value), see frappy.protocol.binary
+    """
+    _frame = None
+    _text = None
+    binary = None
+    _binary_parts = None
+    _binary_frame = None
+
+    def __new__(cls, action, specifier=None, data=None):
+        return tuple.__new__(cls, (action, specifier, data))
+
+    @property
+    def frame(self):
+        """the encoded msg_frame (bytes, including EOL)"""
+        if self._frame is None:
+            self._frame = encode_msg_frame(*self)
+        return self._frame
+
+    @property
+    def text(self):
+        """the encoded msg as str, without EOL (for websockets)"""
+        if self._text is None:
+            self._text = self.frame[:-len(EOL)].decode('utf-8')
+        return self._text
+
+    @property
+    def binary_parts(self):
+        """the header frame, the binary data and the frame with null as value
+
+        for connections with binary transfer. empty when not applicable
+        """
+        if self._binary_parts is None:
+            payload = encode_payload(*self.binary) if self.binary else None
+            if payload is None:
+                self._binary_parts = ()
+            else:
+                action, specifier, data = self
+                self._binary_parts = (
+                    encode_msg_frame(BINARYHEADER, specifier,
+                                     {'format': self.binary[0], 'size': len(payload)}),
+                    payload,
+                    encode_msg_frame(action, specifier, [None] + data[1:]))
+        return self._binary_parts
+
+    @property
+    def binary_frame(self):
+        """the binary parts joined, or the plain frame when not applicable"""
+        if self._binary_frame is None:
+            self._binary_frame = b''.join(self.binary_parts) or self.frame
+        return self._binary_frame
+
+
+class MessageBuffer:
+    """buffer for received data, deframing messages in linear time
+
+    the data is appended to a bytearray, and a scan offset avoids searching
+    again for EOL in already scanned data. consumed data is removed only when
+    all complete messages are taken
     """
-    if EOL not in _bytes:
-        return None, _bytes
-    return _bytes.split(EOL, 1)
+    def __init__(self):
+        self.data = bytearray()
+        self.start = 0  # start of the next message
+        self.scanned = 0  # data[start:scanned] does not contain EOL
+
+    def ingest(self, newdata):
+        self.data += newdata
+
+    def get_msg(self):
+        """return the next message (without EOL) or None"""
+        end = self.data.find(EOL, self.scanned)
+        if end < 0:
+            # no complete message: remove consumed data
+            if self.start:
+                del self.data[:self.start]
+                self.start = 0
+            self.scanned = len(self.data)
+            return None
+        msg = bytes(self.data[self.start:end])
+        self.start = self.scanned = end + len(EOL)
+        return msg
 
 
 def decode_msg(msg):
     """decode the (binary) msg into a (str) msg_triple"""
     res = msg.strip().decode('utf-8').split(' ', 2) + ['', '']
     action, specifier, data = res[0:3]
-    return action, specifier or None, None if data == '' else json.loads(data)
+    return action, specifier or None, None if data == '' else jsoncodec.loads(data, (action, specifier))
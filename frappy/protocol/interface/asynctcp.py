@@ -0,0 +1,238 @@
+# *****************************************************************************
+# This program is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+# *****************************************************************************
+"""asyncio based TCP interface to the SECoP Server
+
+an alternative to the TCP interface, with a single event loop thread for all
+client connections instead of one thread per client. the requests are handled
+by a pool of worker threads, requests of one connection are handled in order.
+the framing is the same as for the TCP interface.
+
+use the uri 'asyncio://<port>' to select it
+"""
+
+import asyncio
+import errno
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from frappy.datatypes import BoolType, IntRange, StringType
+from frappy.lib import SECoP_DEFAULT_PORT
+from frappy.properties import Property
+from frappy.protocol.interface import EncodedMessage, MessageBuffer, \
+    encode_msg_frame
+from frappy.protocol.interface.handler import DecodeError, RequestHandler
+from frappy.protocol.interface.tcp import MESSAGE_READ_SIZE, \
+    TCPRequestHandler, format_address
+
+# a client not reading its data is disconnected when its output buffer
+# exceeds this size
+MAX_WRITE_BUFFER = 16 * 1024 * 1024
+
+
+class AsyncTCPRequestHandler(TCPRequestHandler):
+    """handles one client connection on the event loop
+
+    the deframing is inherited from TCPRequestHandler, but receive and
+    send are done with asyncio streams
+    """
+
+    # pylint: disable=super-init-not-called
+    def __init__(self, reader, writer, server):
+        self.reader = reader
+        self.writer = writer
+        self.request = writer
+        self.client_address = writer.get_extra_info('peername')
+        self.server = server
+        self.loop = asyncio.get_running_loop()
+        self.log = None
+
+    async def serve(self):
+        """serve the connection until closed"""
+        try:
+            self.setup()
+            while self.running:
+                newdata = await self.reader.read(MESSAGE_READ_SIZE)
+                if not newdata:
+                    break
+                self.ingest(newdata)
+                while self.running:
+                    try:
+                        msg = self.next_message()
+                        if msg is None:
+                            break  # no more messages to process
+                    except DecodeError as err:
+                        self.send_result(self.decode_error_result(err))
+                    else:
+                        # the dispatcher may block, so call it from a worker thread
+                        result = await self.loop.run_in_executor(
+                            self.server.executor, self.handle_message, msg)
+                        self.send_result(result)
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        except Exception as e:
+            (self.log or self.server.log).exception(e)
+        finally:
+            self.finish()
+
+    def setup(self):
+        RequestHandler.setup(self)
+        self.data = MessageBuffer()
+        self.server.connections.add(self)
+
+    def finish(self):
+        """called when serve() terminates, i.e. the socket closed"""
+        self.running = False
+        self.server.connections.discard(self)
+        RequestHandler.finish(self)
+        self.writer.close()
+
+    def close(self):
+        """close the connection, may be called from any thread
+
+        unsent data is discarded, as closing must not wait for a slow client.
+        serve() then terminates, removing the connection from the dispatcher
+        """
+        self.running = False
+        try:
+            self.loop.call_soon_threadsafe(self.writer.transport.abort)
+        except RuntimeError:  # loop closed
+            pass
+
+    def send_reply(self, data):
+        """send reply
+
+        may be called from any thread. the data is written from the event loop
+        """
+        if not data:
+            self.log.error('should not reply empty data!')
+            return
+        if isinstance(data, EncodedMessage):
+            if data.binary and data.binary[0] in self.binary:
+                outdata = data.binary_frame
+            else:
+                outdata = data.frame
+        else:
+            outdata = encode_msg_frame(*data)
+        if self.running:
+            try:
+                self.loop.call_soon_threadsafe(self._write, outdata)
+            except RuntimeError:  # loop closed
+                self.running = False
+
+    def _write(self, outdata):
+        if not self.running:
+            return
+        try:
+            self.writer.write(outdata)
+        except Exception as e:
+            self.log.debug('send_reply got an %r, connection closed?', e)
+            self.running = False
+            self.writer.close()
+            return
+        if self.writer.transport.get_write_buffer_size() > MAX_WRITE_BUFFER:
+            self.log.warning('output buffer overflow, disconnect slow client %s', self.format())
+            self.running = False
+            self.writer.close()
+
+    def format(self):
+        return f'from {format_address(self.client_address)}'
+
+
+class AsyncTCPServer:
+    """TCP server with an asyncio event loop serving all connections"""
+
+    # for cfg-editor
+    configurables = {
+        'uri': Property('hostname or ip address for binding', StringType(),
+                        default=f'asyncio://{SECoP_DEFAULT_PORT}', export=False),
+        'detailed_errors': Property('Flag to enable detailed Errorreporting.', BoolType(),
+                                    default=False, export=False),
+        'workers': Property('number of worker threads for handling requests', IntRange(1),
+                            default=8, export=False),
+    }
+
+    def __init__(self, name, logger, options, srv):
+        self.dispatcher = srv.dispatcher
+        self.name = name
+        self.log = logger
+        port = int(options.pop('uri').split('://', 1)[-1])
+        enable_ipv6 = options.pop('ipv6', False)
+        self.detailed_errors = options.pop('detailed_errors', False)
+        self.executor = ThreadPoolExecutor(max_workers=options.pop('workers', 8),
+                                           thread_name_prefix=f'{name}-worker')
+        self.connections = set()
+
+        self.log.info("AsyncTCPServer %s binding to port %d", name, port)
+        self.loop = asyncio.new_event_loop()
+        maxtry = 5
+        for ntry in range(maxtry):
+            try:
+                self.server = self.loop.run_until_complete(asyncio.start_server(
+                    self._handle_connection, None if enable_ipv6 else '0.0.0.0', port,
+                    reuse_address=os.name != 'nt'))
+                break
+            except OSError as e:
+                if ntry < maxtry - 1 and e.errno == errno.EADDRINUSE:  # address already in use
+                    # this may happen after restarting for a short time even with reuse_address
+                    time.sleep(0.3 * (1 << ntry))  # max accumulated sleep time: 0.3 * 31 = 9.3 sec
+                else:
+                    self.log.error('could not initialize AsyncTCP Server: %r', e)
+                    self.loop.close()
+                    self.executor.shutdown(wait=False)
+                    raise
+        if ntry:
+            self.log.warning('tried again %d times after "Address already in use"', ntry)
+        self.log.info("AsyncTCPServer initiated")
+
+    async def _handle_connection(self, reader, writer):
+        await AsyncTCPRequestHandler(reader, writer, self).serve()
+
+    def serve_forever(self):
+        try:
+            self.loop.run_until_complete(self.server.serve_forever())
+        except asyncio.CancelledError:
+            pass
+
+    def _stop(self):
+        self.server.close()
+        for conn in list(self.connections):
+            conn.close()
+        for task in asyncio.all_tasks(self.loop):
+            task.cancel()
+
+    def shutdown(self):
+        """stop serving, may be called from any thread"""
+        if not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self._stop)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        if not self.loop.is_closed():
+            self.server.close()
+            for conn in list(self.connections):
+                conn.close()
+            # let the connection tasks finish
+            tasks = asyncio.all_tasks(self.loop)
+            for task in tasks:
+                task.cancel()
+            if tasks:
+                self.loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            self.loop.close()
+        self.executor.shutdown(wait=False)
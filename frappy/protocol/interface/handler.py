@@ -20,6 +20,7 @@
 # *****************************************************************************
 """The common parts of the SECNodes outside interfaces"""
 
+import socket
 import sys
 import threading
 
@@ -54,7 +55,11 @@ class RequestHandler:
     and extend (override) setup() and finish() if needed.
 
     For an example, have a look at TCPRequestHandler.
+
+    Interfaces able to send binary data (see frappy.protocol.binary) set
+    supports_binary and handle the messages with the binary attribute set.
     """
+    supports_binary = False
 
     # Methods from BaseRequestHandler
     def __init__(self, request, client_address, server):
@@ -83,14 +88,11 @@ class RequestHandler:
         self.running = True
         # overwrite this with an appropriate buffer if needed
         self.data = None
+        # the formats to be sent as binary data, requested with '_binary'
+        self.binary = ()
 
     def handle(self):
         """handle a new connection"""
-        # copy state info
-        serverobj = self.server
-        # copy relevant settings from Interface
-        detailed_errors = serverobj.detailed_errors
-
         # start serving
         while self.running:
             try:
@@ -112,80 +114,105 @@ class RequestHandler:
                     if msg is None:
                         break  # no more messages to process
                 except DecodeError as err:
-                    # we have to decode 'origin' here
-                    # use latin-1, as utf-8 or ascii may lead to encoding errors
-                    msg = err.raw_msg.decode('latin-1').split(' ', 3) + [
-                        None
-                    ]  # make sure len(msg) > 1
-                    result = (
-                        ERRORPREFIX + msg[0],
-                        msg[1],
-                        [
-                            'InternalError', str(err),
-                            {
-                                'exception': formatException(),
-                                'traceback': formatExtendedStack()
-                            }
-                        ]
-                    )
-                    print('--------------------')
-                    print(formatException())
-                    print('--------------------')
-                    print(formatExtendedTraceback(sys.exc_info()))
-                    print('====================')
+                    self.send_result(self.decode_error_result(err))
                 else:
-                    try:
-                        if msg[0] == HELPREQUEST:
-                            self.handle_help()
-                            result = (HELPREPLY, None, None)
-                        else:
-                            result = serverobj.dispatcher.handle_request(self,
-                                                                         msg)
-                    except SECoPError as err:
-                        result = (
-                            ERRORPREFIX + msg[0],
-                            msg[1],
-                            [
-                                err.name,
-                                str(err),
-                                {
-                                    'exception': formatException(),
-                                    'traceback': formatExtendedStack()
-                                }
-                            ]
-                        )
-                    except Exception as err:
-                        # create Error Obj instead
-                        result = (
-                            ERRORPREFIX + msg[0],
-                            msg[1],
-                            [
-                                'InternalError',
-                                repr(err),
-                                {
-                                    'exception': formatException(),
-                                    'traceback': formatExtendedStack()
-                                }
-                            ]
-                        )
-                        print('--------------------')
-                        print(formatException())
-                        print('--------------------')
-                        print(formatExtendedTraceback(sys.exc_info()))
-                        print('====================')
-
-                if not result:
-                    self.log.error('empty result upon msg %s', repr(msg))
-                if result[0].startswith(ERRORPREFIX) and not detailed_errors:
-                    # strip extra information
-                    result[2][2].clear()
-                self.send_reply(result)
+                    self.send_result(self.handle_message(msg))
+
+    def decode_error_result(self, err):
+        """create the error reply for a message which could not be decoded"""
+        # we have to decode 'origin' here
+        # use latin-1, as utf-8 or ascii may lead to encoding errors
+        msg = err.raw_msg.decode('latin-1').split(' ', 3) + [
+            None
+        ]  # make sure len(msg) > 1
+        result = (
+            ERRORPREFIX + msg[0],
+            msg[1],
+            [
+                'InternalError', str(err),
+                {
+                    'exception': formatException(),
+                    'traceback': formatExtendedStack()
+                }
+            ]
+        )
+        print('--------------------')
+        print(formatException())
+        print('--------------------')
+        print(formatExtendedTraceback(sys.exc_info()))
+        print('====================')
+        return result
+
+    def handle_message(self, msg):
+        """handle a decoded message
+
+        returns the reply, or an error reply in case of errors
+        """
+        try:
+            if msg[0] == HELPREQUEST:
+                self.handle_help()
+                return (HELPREPLY, None, None)
+            return self.server.dispatcher.handle_request(self, msg)
+        except SECoPError as err:
+            return (
+                ERRORPREFIX + msg[0],
+                msg[1],
+                [
+                    err.name,
+                    str(err),
+                    {
+                        'exception': formatException(),
+                        'traceback': formatExtendedStack()
+                    }
+                ]
+            )
+        except Exception as err:
+            # create Error Obj instead
+            result = (
+                ERRORPREFIX + msg[0],
+                msg[1],
+                [
+                    'InternalError',
+                    repr(err),
+                    {
+                        'exception': formatException(),
+                        'traceback': formatExtendedStack()
+                    }
+                ]
+            )
+            print('--------------------')
+            print(formatException())
+            print('--------------------')
+            print(formatExtendedTraceback(sys.exc_info()))
+            print('====================')
+            return result
+
+    def send_result(self, result):
+        """send the reply to a request"""
+        if not result:
+            self.log.error('empty result upon request')
+        if result[0].startswith(ERRORPREFIX) and not self.server.detailed_errors:
+            # strip extra information
+            result[2][2].clear()
+        self.server.dispatcher.send_to(self, result)
 
     def handle_help(self):
         for idx, line in enumerate(HelpMessage.splitlines()):
             # not sending HELPREPLY here, as there should be only one reply for
             # every request
-            self.send_reply(('_', f'{idx + 1}', line))
+            self.server.dispatcher.send_to(self, ('_', f'{idx + 1}', line))
+
+    def close(self):
+        """close the connection, may be called from any thread
+
+        the socket is shut down, so that handle() terminates and finish()
+        removes the connection from the dispatcher
+        """
+        self.running = False
+        try:
+            self.request.shutdown(socket.SHUT_RDWR)
+        except Exception:
+            pass
 
     def finish(self):
         """called when handle() terminates, i.e. the socket closed"""
@@ -29,13 +29,14 @@ import time
 from frappy.datatypes import BoolType, StringType
 from frappy.lib import SECoP_DEFAULT_PORT
 from frappy.properties import Property
-from frappy.protocol.interface import decode_msg, encode_msg_frame, get_msg
+from frappy.protocol.interface import EncodedMessage, MessageBuffer, \
+    decode_msg, encode_msg_frame
 from frappy.protocol.interface.handler import ConnectionClose, \
     RequestHandler, DecodeError
 from frappy.protocol.messages import HELPREQUEST
 
 
-MESSAGE_READ_SIZE = 1024
+MESSAGE_READ_SIZE = 65536
 
 
 def format_address(addr):
@@ -48,10 +49,12 @@ def format_address(addr):
 
 
 class TCPRequestHandler(RequestHandler):
+    supports_binary = True
+
     def setup(self):
         super().setup()
         self.request.settimeout(1)
-        self.data = b''
+        self.data = MessageBuffer()
 
     def finish(self):
         """called when handle() terminates, i.e. the socket closed"""
@@ -65,11 +68,11 @@ class TCPRequestHandler(RequestHandler):
             self.request.close()
 
     def ingest(self, newdata):
-        self.data += newdata
+        self.data.ingest(newdata)
 
     def next_message(self):
         try:
-            message, self.data = get_msg(self.data)
+            message = self.data.get_msg()
             if message is None:
                 return None
             if message.strip() == b'':
@@ -98,7 +101,13 @@ class TCPRequestHandler(RequestHandler):
         if not data:
             self.log.error('should not reply empty data!')
             return
-        outdata = encode_msg_frame(*data)
+        if isinstance(data, EncodedMessage):
+            if data.binary and data.binary[0] in self.binary:
+                outdata = data.binary_frame
+            else:
+                outdata = data.frame
+        else:
+            outdata = encode_msg_frame(*data)
         with self.send_lock:
             if self.running:
                 try:
@@ -18,12 +18,13 @@
 #
 # *****************************************************************************
 
-import json
 from functools import partial
 
 from websockets.exceptions import ConnectionClosedOK, ConnectionClosedError
 from websockets.sync.server import CloseCode, serve
 
+from frappy.lib import jsoncodec
+from frappy.protocol.interface import EOL, EncodedMessage
 from frappy.protocol.interface.handler import ConnectionClose, \
     RequestHandler, DecodeError
 from frappy.protocol.messages import HELPREQUEST
@@ -34,12 +35,13 @@ def encode_msg_frame_str(action, specifier=None, data=None):
 
     action (and optional specifier) are str strings,
     data may be an json-yfied python object"""
-    msg = (action, specifier or '', '' if data is None else json.dumps(data))
+    msg = (action, specifier or '', '' if data is None else jsoncodec.dumps(data))
     return ' '.join(msg).strip()
 
 
 class WSRequestHandler(RequestHandler):
     """Handles a Websocket connection."""
+    supports_binary = True
 
     def __init__(self, conn, server):
         self.conn = conn
@@ -78,7 +80,7 @@ class WSRequestHandler(RequestHandler):
             return (
                 action,
                 specifier or None,
-                None if data == '' else json.loads(data)
+                None if data == '' else jsoncodec.loads(data, (action, specifier))
             )
         except Exception as e:
             raise DecodeError('exception when reading in message',
@@ -108,11 +110,20 @@ class WSRequestHandler(RequestHandler):
         if not data:
             self.log.error('should not reply empty data!')
             return
-        outdata = encode_msg_frame_str(*data)
+        if not isinstance(data, EncodedMessage):
+            outdata = [encode_msg_frame_str(*data)]
+        elif data.binary and data.binary[0] in self.binary and data.binary_parts:
+            # header and message as text, the binary data in a binary frame
+            header, payload, frame = data.binary_parts
+            outdata = [header[:-len(EOL)].decode('utf-8'), payload,
+                       frame[:-len(EOL)].decode('utf-8')]
+        else:
+            outdata = [data.text]
         with self.send_lock:
             if self.running:
                 try:
-                    self.conn.send(outdata)
+                    for item in outdata:
+                        self.conn.send(item)
                 except (BrokenPipeError, IOError) as e:
                     self.log.debug('send_reply got an %r, connection closed?',
                                    e)
@@ -66,6 +66,22 @@ LOGGING_REPLY = 'logging'
 LOG_EVENT = 'log'
 # + [module:level] + json_string (message)
 
+READMANYREQUEST = '_readmany'  # + json list of specifiers
+READMANYREPLY = '_readmanyreply'
+# + json list of [action, specifier, data], as replied to single read requests
+
+POLLSTATSREQUEST = '_pollstats'  # + optional module
+POLLSTATSREPLY = '_pollstatsreply'
+# + optional module + json object with the poll statistics
+
+BINARYREQUEST = '_binary'  # + optional json list of formats
+BINARYREPLY = '_binaryreply'
+# + json list of the formats which will be sent as binary data
+
+BINARYHEADER = '_bin'
+# + specifier + json {"format": <format>, "size": <nbytes>}
+# followed by <nbytes> of binary data and the message with the value replaced by null
+
 # helper mapping to find the REPLY for a REQUEST
 # do not put IDENTREQUEST/IDENTREPLY here, as this needs anyway extra treatment
 REQUEST2REPLY = {
@@ -78,6 +94,9 @@ REQUEST2REPLY = {
     HEARTBEATREQUEST:     HEARTBEATREPLY,
     HELPREQUEST:          HELPREPLY,
     LOGGING_REQUEST:      LOGGING_REPLY,
+    READMANYREQUEST:      READMANYREPLY,
+    POLLSTATSREQUEST:     POLLSTATSREPLY,
+    BINARYREQUEST:        BINARYREPLY,
 }
 
 
@@ -85,6 +104,9 @@ HelpMessage = f"""Try one of the following:
             '{IDENTREQUEST}' to query protocol version
             '{DESCRIPTIONREQUEST}' to read the description
             '{READREQUEST} <module>[:<parameter>]' to request reading a value
+            '{READMANYREQUEST} [<specifier>, ...]' to request reading several values
+            '{POLLSTATSREQUEST} [<module>]' to request poll statistics
+            '{BINARYREQUEST}' to receive blobs and numeric arrays as binary data
             '{WRITEREQUEST} <module>[:<parameter>] value' to request changing a value
             '{COMMANDREQUEST} <module>[:<command>]' to execute a command
             '{HEARTBEATREQUEST} <nonce>' to request a heartbeat response
@@ -0,0 +1,176 @@
+# *****************************************************************************
+#
+# This program is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+# *****************************************************************************
+"""outgoing message queues for connections
+
+decouples the threads producing messages (usually poll threads calling
+announceUpdate) from the speed of the client connections
+"""
+
+import threading
+from collections import deque
+
+from frappy.errors import ConfigError
+from frappy.lib import mkthread
+from frappy.protocol.messages import ERRORPREFIX, EVENTREPLY
+
+EVENTS = {EVENTREPLY, ERRORPREFIX + EVENTREPLY}
+
+OVERFLOW_POLICIES = ('coalesce', 'disconnect', 'block')
+
+
+class PendingUpdate:
+    """queue slot of a pending update, the update may be replaced until sent"""
+    __slots__ = ['msg']
+
+    def __init__(self, msg):
+        self.msg = msg  # None when moved to the end of the queue
+
+
+class OutputQueue:
+    """bounded queue of outgoing messages for one connection
+
+    the messages are sent by a dedicated writer thread, calling
+    conn.send_reply. the overflow policy determines what happens
+    when the queue is full:
+
+    - 'coalesce': replace pending updates by newer ones. when the queue is
+      full of other messages (replies, log messages), the client is
+      disconnected
+    - 'disconnect': close the connection of the slow client
+    - 'block': wait until the writer has made space
+
+    pending updates are keyed by specifier. the first pending update of
+    each parameter does not count towards maxlen, so the burst of initial
+    updates after 'activate' does not overflow the queue. only further
+    updates of a parameter not yet sent, replies and log messages do.
+
+    with the 'coalesce' policy, a new update of a parameter replaces the
+    pending one, so a lagging client gets the latest value of each parameter
+    instead of an ever growing backlog. no message is dropped, the queue is
+    bounded by one update per parameter, in addition to maxlen replies and
+    log messages. when a reply for the parameter was queued after the pending
+    update, the pending update is removed and the new one is queued at the
+    end, so the client never gets a reply after a newer update
+    """
+
+    def __init__(self, conn, maxlen, overflow, log):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ConfigError(f'overflow policy must be one of {OVERFLOW_POLICIES}, not {overflow!r}')
+        self.conn = conn
+        self.maxlen = maxlen
+        self.overflow = overflow
+        self.log = log
+        # items are messages, or PendingUpdate slots
+        self.queue = deque()
+        self.pending = {}  # map specifier -> PendingUpdate
+        # specifiers with other messages queued after their pending update
+        self.overtaken = set()
+        # number of messages in the queue other than the first pending update
+        # of a parameter. maxlen applies to this number
+        self.backlog = 0
+        self.cond = threading.Condition()
+        self.running = True
+        self.coalesced = 0  # number of updates replaced by a newer one
+        mkthread(self._writer)
+
+    def put(self, msg):
+        """put a message into the queue, obeying the overflow policy"""
+        with self.cond:
+            if not self.running:
+                return
+            if msg[0] in EVENTS:
+                slot = self.pending.get(msg[1])
+                if slot is None:
+                    # the first pending update of a parameter (e.g. after activate)
+                    # is not counted as backlog
+                    self._append_pending(msg)
+                    return
+                if self.overflow == 'coalesce':
+                    self.coalesced += 1
+                    if msg[1] in self.overtaken:
+                        # a reply is queued after the pending update: the new
+                        # update has to be sent after the reply
+                        slot.msg = None
+                        self._append_pending(msg)
+                    else:
+                        slot.msg = msg
+                    return
+            elif msg[1] in self.pending:
+                self.overtaken.add(msg[1])
+            if self.backlog >= self.maxlen:
+                # with 'coalesce', only replies and log messages count here:
+                # a client not reading at all is disconnected
+                if self.overflow == 'block':
+                    while self.running and self.backlog >= self.maxlen:
+                        self.cond.wait()
+                    if not self.running:
+                        return
+                else:  # 'disconnect' or 'coalesce'
+                    self.log.warning('output queue full, disconnect slow client %s',
+                                     getattr(self.conn, 'format', self.conn.__repr__)())
+                    self._stop()
+                    # removes the connection from the dispatcher, when the
+                    # handler has terminated
+                    self.conn.close()
+                    return
+            self.queue.append(msg)
+            self.backlog += 1
+            self.cond.notify_all()
+
+    def _append_pending(self, msg):
+        slot = PendingUpdate(msg)
+        self.pending[msg[1]] = slot
+        self.overtaken.discard(msg[1])
+        self.queue.append(slot)
+        self.cond.notify_all()
+
+    def _stop(self):
+        self.running = False
+        self.queue.clear()
+        self.pending.clear()
+        self.overtaken.clear()
+        self.backlog = 0
+        self.cond.notify_all()
+
+    def statistics(self):
+        """return the counter of coalesced updates"""
+        return {'coalesced': self.coalesced}
+
+    def close(self):
+        """stop the writer thread, discarding pending messages"""
+        with self.cond:
+            self._stop()
+
+    def _writer(self):
+        while True:
+            with self.cond:
+                while self.running and not self.queue:
+                    self.cond.wait()
+                if not self.running:
+                    return
+                msg = self.queue.popleft()
+                if isinstance(msg, PendingUpdate):
+                    msg = msg.msg
+                    if msg is None:
+                        continue  # moved to the end of the queue
+                    del self.pending[msg[1]]
+                    self.overtaken.discard(msg[1])
+                else:
+                    self.backlog -= 1
+                self.cond.notify_all()  # wake up producers waiting for space
+            self.conn.send_reply(msg)
@@ -44,6 +44,8 @@ from frappy.protocol.messages import COMMANDREQUEST, DESCRIPTIONREPLY, \
 class SecopClient(frappy.client.SecopClient):
     disconnectedExc = frappy.errors.CommunicationFailedError('remote SEC node disconnected')
     disconnectedError = (disconnectedExc.name, str(disconnectedExc))
+    # the replies are forwarded as they are, they must stay JSON serializable
+    binary_transfer = False
 
     def __init__(self, uri, log, dispatcher):
         self.dispatcher = dispatcher
@@ -130,8 +132,9 @@ class Router(frappy.protocol.dispatcher.Dispatcher):
         if self.singlenode:
             return DESCRIPTIONREPLY, specifier, self.singlenode.descriptive_data
         reply = super().handle_describe(conn, specifier, data)
-        result = reply[2]
-        allmodules = result.get('modules', {})
+        # copy, as the description is cached by the secnode
+        result = dict(reply[2])
+        allmodules = dict(result.get('modules', {}))
         node_description = [result['description']]
         for node in self.nodes:
             data = node.descriptive_data.copy()
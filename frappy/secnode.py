@@ -25,6 +25,8 @@ from collections import OrderedDict
 from frappy.dynamic import Pinata
 from frappy.errors import ConfigError, NoSuchModuleError, NoSuchParameterError
 from frappy.lib import get_class
+from frappy.poller import PollPool, PollWatchdog, StartupLimiter
+from frappy.properties import HasProperties
 from frappy.version import get_version
 
 
@@ -35,10 +37,34 @@ class SecNode:
      - add_module(module, modulename)
      - get_module(modulename) returns the requested module or None if there is
        no suitable configuration on the server
+
+    Options (given as keywords in the Node section of the cfg file):
+     - poll_workers: when > 0, modules without io are polled by a pool
+       of the given number of threads instead of a thread per module
+     - startup_limit: when > 0, the max. number of ios connected to the same
+       host doing their initialisation at the same time
+     - poll_deadline: when > 0, a poll function not returning within this
+       time is reported, and its parameters get a timeout readerror
+     - poll_backoff: the time a stuck poll function is skipped after it returned
     """
 
     def __init__(self, name, logger, options, srv):
         self.equipment_id = options.pop('equipment_id', name)
+        poll_workers = options.pop('poll_workers', 0)
+        if not isinstance(poll_workers, int) or poll_workers < 0:
+            raise ConfigError('poll_workers must be an integer >= 0')
+        self.pollPool = PollPool(poll_workers, logger.getChild('pollpool')) if poll_workers else None
+        startup_limit = options.pop('startup_limit', 0)
+        if not isinstance(startup_limit, int) or startup_limit < 0:
+            raise ConfigError('startup_limit must be an integer >= 0')
+        self.startupLimiter = StartupLimiter(startup_limit) if startup_limit else None
+        poll_deadline = options.pop('poll_deadline', 0)
+        poll_backoff = options.pop('poll_backoff', 0)
+        for key, value in ('poll_deadline', poll_deadline), ('poll_backoff', poll_backoff):
+            if not isinstance(value, (int, float)) or value < 0:
+                raise ConfigError(f'{key} must be a number >= 0')
+        self.pollWatchdog = PollWatchdog(poll_deadline, poll_backoff,
+                                         logger.getChild('watchdog')) if poll_deadline else None
         self.nodeprops = {}
         # map ALL modulename -> moduleobj
         self.modules = {}
@@ -52,11 +78,16 @@ class SecNode:
         self.errors = []
         self.traceback_counter = 0
         self.name = name
+        # map specifier -> cached descriptive data
+        self._description_cache = {}
+        # value of HasProperties.propertyChanges when the cache was filled
+        self._description_changes = None
 
     def add_secnode_property(self, prop, value):
         """Add SECNode property. If starting with an underscore, it is exported
         in the description."""
         self.nodeprops[prop] = value
+        self.invalidate_description()
 
     def get_secnode_property(self, prop):
         """Get SECNode property.
@@ -202,10 +233,29 @@ class SecNode:
         self.log.debug('-> module is not to be exported!')
         return OrderedDict()
 
+    def invalidate_description(self):
+        """clear the cached descriptive data"""
+        self._description_cache = {}
+
     def get_descriptive_data(self, specifier):
         """returns a python object which upon serialisation results in the
-        descriptive data"""
+        descriptive data
+
+        the result is cached until properties are changed.
+        it must not be modified by the caller
+        """
         specifier = specifier or ''
+        changes = HasProperties.propertyChanges
+        if changes != self._description_changes:
+            self._description_cache = {}
+            self._description_changes = changes
+        result = self._description_cache.get(specifier)
+        if result is None:
+            result = self._make_descriptive_data(specifier)
+            self._description_cache[specifier] = result
+        return result
+
+    def _make_descriptive_data(self, specifier):
         modules = {}
         result = {'modules': modules}
         for modulename in self.export:
@@ -242,6 +292,7 @@ class SecNode:
         self.modules[modulename] = module
         if module.export:
             self.export.append(modulename)
+        self.invalidate_description()
 
     # def remove_module(self, modulename_or_obj):
     #     moduleobj = self.get_module(modulename_or_obj)
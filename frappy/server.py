@@ -59,6 +59,7 @@ class Server:
     INTERFACES = {
         'tcp': 'protocol.interface.tcp.TCPServer',
         'ws': 'protocol.interface.ws.WSServer',
+        'asyncio': 'protocol.interface.asynctcp.AsyncTCPServer',
     }
     _restart = True
 
@@ -304,7 +305,7 @@ class Server:
         self.secnode.create_modules()
         # initialize all modules by getting them with Dispatcher.get_module,
         # which is done in the get_descriptive data
-        # TODO: caching, to not make this extra work
+        # the result is cached for the first describe request
         self.secnode.get_descriptive_data('')
         # =========== All modules are initialized ===========
 
@@ -338,6 +339,12 @@ class Server:
             for name in start_events.waiting_for():
                 self.log.warning('timeout when starting %s', name)
         self.log.info('all modules started')
+        durations = sorted(((modobj.startupDuration, modname)
+                            for modname, modobj in self.secnode.modules.items()
+                            if modobj.startupDuration is not None), reverse=True)
+        if durations:
+            self.log.info('startup durations: %s',
+                          ', '.join(f'{modname} {duration:.3g}s' for duration, modname in durations))
         history_path = os.environ.get('FRAPPY_HISTORY')
         if history_path:
             from frappy_psi.historywriter import \
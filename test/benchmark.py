@@ -0,0 +1,116 @@
+# *****************************************************************************
+#
+# This program is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+# *****************************************************************************
+"""micro-benchmarks for the wire path
+
+run with 'python -m test.benchmark' from the top directory
+"""
+
+import copy
+import json
+import time
+
+from frappy.datatypes import FloatRange, NumpyArrayOf
+from frappy.lib import jsoncodec
+from frappy.params import Parameter
+from test.test_announceupdate import Mod, create_module
+from test.test_client import Client, make_description
+from test.test_jsoncodec import DESCRIBING, UPDATE, available_codecs
+
+
+def bench(func, args, seconds=0.5):
+    """call func(*arg) for each arg in args repeatedly
+
+    :return: the time per call in seconds
+    """
+    n = 0
+    t0 = time.perf_counter()
+    t = t0
+    while t < t0 + seconds:
+        for arg in args:
+            func(*arg)
+        n += len(args)
+        t = time.perf_counter()
+    return (t - t0) / n
+
+
+def bench_jsoncodec():
+    # a description with integers beyond 64 bit, which orjson can not decode exactly
+    bigint = copy.deepcopy(DESCRIBING)
+    bigint['modules']['mod0']['accessibles']['value']['datainfo'] = {
+        'type': 'int', 'min': -2**64, 'max': 2**64}
+    samples = [('update', UPDATE, ('update', 'mod:value')),
+               ('describing', DESCRIBING, ('describing', '.')),
+               ('describing, big ints', bigint, ('describing', '.'))]
+    previous = jsoncodec.codec
+    for title, sample, key in samples:
+        text = json.dumps(sample)
+        print(f'{title} message, {len(text)} bytes')
+        print(f'    encode                {bench(jsoncodec.dumps, [(sample,)]) * 1e6:10.2f} us')
+        reference = None
+        for name in reversed(available_codecs()):  # 'json' first
+            jsoncodec.select_codec(name)
+            duration = bench(jsoncodec.loads, [(text, key)])
+            reference = reference or duration
+            print(f'    decode {name:15s}{duration * 1e6:10.2f} us {reference / duration:6.2f} x')
+    jsoncodec.select_codec(previous)
+
+
+def bench_announceupdate():
+    module, _ = create_module(omit_unchanged_within=0)
+    array = [float(i) for i in range(1000)]
+    cases = [
+        ('scalar, changed', module, [('scalar', float(i)) for i in range(100)]),
+        ('scalar, unchanged', module, [('scalar', 1.0)] * 100),
+        ('array, changed', module, [('array', array), ('array', array[::-1])]),
+        ('array, unchanged', module, [('array', array)] * 2),
+        # the value stored in the parameter is not converted again
+        ('array, stored value', module, [('array', module.array)]),
+    ]
+    try:
+        import numpy  # pylint: disable=import-outside-toplevel
+    except ImportError:
+        numpy = None
+    if numpy:
+        class NumpyMod(Mod):
+            array = Parameter(datatype=NumpyArrayOf(FloatRange(), 0, 1000))
+
+        npmodule, _ = create_module(omit_unchanged_within=0, cls=NumpyMod)
+        array = numpy.arange(1000.)
+        cases.extend([('numpy, changed', npmodule, [('array', array), ('array', array[::-1])]),
+                      ('numpy, unchanged', npmodule, [('array', array)] * 2)])
+    for title, mod, case in cases:
+        print(f'announceUpdate, {title:20s} {1 / bench(mod.announceUpdate, case):10.0f} updates/s')
+
+
+def bench_client():
+    description = make_description(100)
+    client = Client()
+
+    def init(description):
+        client._init_descriptive_data(description)
+        client.modules = {}
+
+    print(f'init, cached datatypes:   {bench(init, [(description,)]) * 1e3:8.2f} ms')
+    print(f'reconnect, no changes:    '
+          f'{bench(client._init_descriptive_data, [(description,)]) * 1e3:8.2f} ms')
+
+
+if __name__ == '__main__':
+    bench_jsoncodec()
+    bench_announceupdate()
+    bench_client()
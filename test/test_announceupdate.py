@@ -0,0 +1,121 @@
+# *****************************************************************************
+#
+# This program is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+# *****************************************************************************
+"""test announceUpdate"""
+
+import logging
+
+import pytest
+
+from frappy.datatypes import ArrayOf, FloatRange, NumpyArrayOf
+from frappy.errors import HardwareError
+from frappy.lib import generalConfig
+from frappy.modules import Module
+from frappy.params import Parameter
+
+
+class DispatcherStub:
+    def __init__(self):
+        self.updates = []
+
+    def announce_update(self, moduleobj, pobj):
+        self.updates.append((pobj.name, pobj.value, pobj.readerror))
+
+
+class ServerStub:
+    def __init__(self, omit_unchanged_within):
+        generalConfig.testinit(omit_unchanged_within=omit_unchanged_within)
+        self.dispatcher = DispatcherStub()
+        self.secnode = None
+
+
+class Mod(Module):
+    scalar = Parameter('a scalar', FloatRange(), default=0)
+    array = Parameter('an array', ArrayOf(FloatRange(), 0, 1000), default=[])
+
+
+def create_module(omit_unchanged_within=0.1, cls=Mod):
+    srv = ServerStub(omit_unchanged_within)
+    return cls('mod', logging.getLogger('mod'), {'description': ''}, srv), srv.dispatcher.updates
+
+
+def test_unchanged():
+    mod, updates = create_module()
+    mod.announceUpdate('scalar', 1)
+    mod.announceUpdate('scalar', 1.0)  # omitted
+    mod.announceUpdate('scalar', 2)
+    assert updates == [('scalar', 1.0, None), ('scalar', 2.0, None)]
+    updates.clear()
+    mod.announceUpdate('array', [1, 2])
+    stored = mod.parameters['array'].value
+    assert stored == (1.0, 2.0)
+    mod.announceUpdate('array', stored)  # omitted
+    mod.announceUpdate('array', [1, 2])  # equal, omitted
+    assert updates == [('array', stored, None)]
+    # the stored value, announced after omit_unchanged_within
+    mod.parameters['array'].timestamp -= 1
+    mod.announceUpdate('array', stored)
+    assert len(updates) == 2
+
+
+def test_errors():
+    mod, updates = create_module()
+    mod.announceUpdate('scalar', 'x')
+    assert updates[-1][2].name == 'WrongType'
+    err = HardwareError('broken')
+    mod.announceUpdate('scalar', err=err)
+    assert updates[-1][2] is err
+    repeated = HardwareError('broken')
+    mod.announceUpdate('scalar', err=repeated)  # no update for a repeated error
+    assert len(updates) == 2
+    assert repeated.report_error is False
+    # a value is always announced after an error
+    mod.announceUpdate('scalar', 0)
+    assert updates[-1] == ('scalar', 0, None)
+    # None is not a valid value, even when stored
+    mod.parameters['scalar'].value = None
+    mod.announceUpdate('scalar', None)
+    assert updates[-1][2].name == 'WrongType'
+
+
+def test_callbacks():
+    mod, _ = create_module()
+    calls = []
+    mod.addCallback('scalar', lambda *args: calls.append(args))
+    mod.announceUpdate('scalar', 1)
+    mod.announceUpdate('scalar', err=HardwareError('broken'))
+    assert calls[0] == (1.0,)
+    assert calls[1][1].name == 'HardwareError'
+
+
+def test_numpy_array():
+    numpy = pytest.importorskip('numpy')
+
+    class NumpyMod(Module):
+        spectrum = Parameter('a spectrum', NumpyArrayOf(FloatRange(), 0, 1000), default=[])
+
+    mod, updates = create_module(cls=NumpyMod)
+    mod.spectrum = numpy.arange(5)
+    stored = mod.spectrum
+    assert isinstance(stored, numpy.ndarray)
+    mod.spectrum = [0, 1, 2, 3, 4]  # unchanged: omitted
+    mod.spectrum = stored  # no conversion
+    assert mod.spectrum is stored
+    assert len(updates) == 1
+    mod.spectrum = numpy.arange(6)
+    assert len(updates) == 2
+    assert mod.parameters['spectrum'].export_value() == [0, 1, 2, 3, 4, 5]
@@ -0,0 +1,133 @@
+# *****************************************************************************
+#
+# This program is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+# *****************************************************************************
+"""test the asyncio TCP interface"""
+
+import socket
+import threading
+
+import pytest
+
+from frappy.errors import NoSuchModuleError
+from frappy.protocol.interface.asynctcp import AsyncTCPServer
+from frappy.protocol.messages import EVENTREPLY, HEARTBEATREPLY
+from frappy.protocol.outqueue import OutputQueue
+
+
+class LoggerStub:
+    def debug(self, fmt, *args):
+        print(fmt % args)
+    info = warning = exception = error = debug
+
+
+class DispatcherStub:
+    def __init__(self):
+        self.connections = []
+        self.connected = threading.Event()
+
+    def add_connection(self, conn):
+        self.connections.append(conn)
+        self.connected.set()
+
+    def remove_connection(self, conn):
+        self.connections.remove(conn)
+
+    def send_to(self, conn, msg):
+        conn.send_reply(msg)
+
+    def handle_request(self, conn, msg):
+        action, specifier, _ = msg
+        if action == 'ping':
+            return HEARTBEATREPLY, specifier, [None, {}]
+        raise NoSuchModuleError('no modules')
+
+
+class QueueDispatcherStub(DispatcherStub):
+    """sending via an output queue, which is full after the first reply"""
+    def add_connection(self, conn):
+        self.outqueue = OutputQueue(conn, 0, 'disconnect', LoggerStub())
+        super().add_connection(conn)
+
+    def send_to(self, conn, msg):
+        self.outqueue.put(msg)
+
+
+class ServerStub:
+    def __init__(self):
+        self.dispatcher = DispatcherStub()
+
+
+@pytest.fixture(name='server')
+def server_():
+    srv = ServerStub()
+    server = AsyncTCPServer('asyncio', LoggerStub(), {'uri': 'asyncio://0'}, srv)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    yield server
+    server.shutdown()
+    thread.join(5)
+    assert not thread.is_alive()
+    server.__exit__()
+
+
+def readlines(sock, n):
+    data = b''
+    while data.count(b'\n') < n:
+        data += sock.recv(1024)
+    return data.decode().splitlines()
+
+
+def test_requests(server):
+    port = server.server.sockets[0].getsockname()[1]
+    with socket.create_connection(('localhost', port), timeout=5) as sock:
+        # pipelined requests, split into arbitrary chunks
+        sock.sendall(b'ping 1\nping 2\nread m')
+        sock.sendall(b'od:value\nping 3\n')
+        assert readlines(sock, 4) == [
+            'pong 1 [null, {}]',
+            'pong 2 [null, {}]',
+            'error_read mod:value ["NoSuchModule", "no modules", {}]',
+            'pong 3 [null, {}]',
+        ]
+        # events may be sent from any thread
+        server.dispatcher.connected.wait(5)
+        conn = server.dispatcher.connections[0]
+        threading.Thread(target=conn.send_reply, args=((EVENTREPLY, 'mod:value', [1, {}]),)).start()
+        assert readlines(sock, 1) == ['update mod:value [1, {}]']
+
+
+def test_disconnect_slow_client(server):
+    server.dispatcher = dispatcher = QueueDispatcherStub()
+    port = server.server.sockets[0].getsockname()[1]
+    with socket.create_connection(('localhost', port), timeout=5) as sock:
+        assert dispatcher.connected.wait(5)
+        conn = dispatcher.connections[0]
+        # a message from another thread, while serve() is waiting for data
+        thread = threading.Thread(target=dispatcher.send_to, args=(conn, ('log', 'mod', 'x')))
+        thread.start()
+        thread.join(5)
+        # the connection is closed by the output queue
+        try:
+            assert sock.recv(1024) == b''
+        except ConnectionResetError:
+            pass
+    for _ in range(50):
+        if not dispatcher.connections:
+            break
+        threading.Event().wait(0.1)
+    assert dispatcher.connections == []
+    assert not dispatcher.outqueue.running
@@ -0,0 +1,205 @@
+# *****************************************************************************
+#
+# This program is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+# *****************************************************************************
+"""test the binary transfer of blobs and numeric arrays"""
+
+import pytest
+
+from frappy.client import SecopClient
+from frappy.datatypes import ArrayOf, BLOBType, FloatRange, IntRange, \
+    ScaledInteger, StringType
+from frappy.errors import ProtocolError
+from frappy.lib import generalConfig
+from frappy.modules import Readable
+from frappy.params import Parameter
+from frappy.protocol.binary import MIN_ITEMS, binary_format, \
+    decode_payload, encode_payload
+from frappy.protocol.dispatcher import Dispatcher
+from frappy.protocol.interface import EncodedMessage, decode_msg
+from frappy.protocol.messages import BINARYREPLY, BINARYREQUEST, \
+    EVENTREPLY, IDENTREQUEST, READREPLY, READREQUEST
+from frappy.secnode import SecNode
+
+
+class LoggerStub:
+    def debug(self, fmt, *args):
+        print(fmt % args)
+    info = warning = exception = error = debug
+    handlers = []
+
+
+@pytest.mark.parametrize('datatype, fmt', [
+    (BLOBType(), 'blob'),
+    (ArrayOf(FloatRange()), 'f8'),
+    (ArrayOf(IntRange(0, 1000)), 'i8'),
+    (ArrayOf(IntRange(0, 1 << 64)), None),
+    (ArrayOf(ScaledInteger(0.1)), None),
+    (ArrayOf(StringType()), None),
+    (FloatRange(), None),
+])
+def test_binary_format(datatype, fmt):
+    assert binary_format(datatype) == fmt
+
+
+@pytest.mark.parametrize('fmt, value', [
+    ('blob', b'\x00\n\xff' * 10),
+    ('f8', [0.5 * i for i in range(100)]),
+    ('i8', [-i for i in range(MIN_ITEMS)]),
+])
+def test_payload(fmt, value):
+    payload = encode_payload(fmt, value)
+    assert len(payload) == len(value) if fmt == 'blob' else 8 * len(value)
+    assert decode_payload(fmt, payload) == value
+
+
+def test_small_array():
+    assert encode_payload('f8', [1.0] * (MIN_ITEMS - 1)) is None
+    msg = EncodedMessage(EVENTREPLY, 'mod:value', [[1.0], {}])
+    msg.binary = 'f8', [1.0]
+    assert msg.binary_parts == ()
+    assert msg.binary_frame == msg.frame
+
+
+def test_numpy_payload():
+    np = pytest.importorskip('numpy')
+    value = [0.25 * i for i in range(100)]
+    assert encode_payload('f8', np.array(value)) == encode_payload('f8', value)
+    assert encode_payload('i8', np.arange(20, dtype='int32')) == encode_payload('i8', list(range(20)))
+
+
+class Server:
+    restart = shutdown = None
+
+    def __init__(self):
+        self.secnode = SecNode('node', LoggerStub(), {}, self)
+        self.dispatcher = Dispatcher('', LoggerStub(), {}, self)
+
+
+class Connection:
+    supports_binary = True
+
+    def __init__(self, dispatcher):
+        self.binary = ()
+        self.result = []
+        dispatcher.add_connection(self)
+
+    def send_reply(self, msg):
+        self.result.append(msg)
+
+
+class IOStub:
+    """replaces the AsynConn of the client, reading from the given data"""
+    def __init__(self, data):
+        self.data = data
+
+    def readbytes(self, nbytes, timeout=None):
+        result, self.data = self.data[:nbytes], self.data[nbytes:]
+        return result
+
+    def readline(self, timeout=None):
+        result, self.data = self.data.split(b'\n', 1)
+        return result
+
+    def shutdown(self):
+        pass
+
+    disconnect = shutdown
+
+
+def test_transfer():
+    generalConfig.testinit()
+
+    class Mod(Readable):
+        value = Parameter('', ArrayOf(FloatRange(), 0, 1000))
+        image = Parameter('', BLOBType(0, 1000), default=b'')
+
+        def read_value(self):
+            return [0.5 * i for i in range(100)]
+
+    srv = Server()
+    mod = Mod('mod', LoggerStub(), {'description': ''}, srv)
+    srv.secnode.add_module(mod, 'mod')
+    conn = Connection(srv.dispatcher)
+    srv.dispatcher.activate_all(conn)
+    reply = srv.dispatcher.handle_request(conn, (READREQUEST, 'mod:value', None))
+    assert reply[0] == READREPLY
+    assert reply[2][0] == list(mod.value)
+    # the update sent to a plain connection
+    assert conn.result[-1].frame.startswith(b'update mod:value [[0.0, 0.5, ')
+
+    reply = srv.dispatcher.handle_request(conn, (BINARYREQUEST, None, None))
+    assert reply == (BINARYREPLY, None, ['blob', 'f8', 'i8'])
+    assert conn.binary == ('blob', 'f8', 'i8')
+    mod.image = b'\x00\x01\n' * 10
+    update = conn.result[-1]
+    header, payload, frame = update.binary_parts
+    assert header == b'_bin mod:_image {"format": "blob", "size": 30}\n'
+    assert payload == mod.image
+    assert frame.startswith(b'update mod:_image [null, {"t": ')
+    assert update.binary_frame == header + payload + frame
+
+    # decode on the client side
+    client = SecopClient('')
+    client.io = IOStub(update.binary_frame)
+    action, ident, data = decode_msg(client.io.readline())
+    action, ident, data = client._read_binary(ident, data)
+    assert (action, ident) == (EVENTREPLY, 'mod:_image')
+    assert BLOBType().import_value(data[0]) == mod.image
+    assert client.io.data == b''
+
+    reply = srv.dispatcher.handle_request(conn, (READREQUEST, 'mod:value', None))
+    client.io = IOStub(reply.binary_frame)
+    action, ident, data = decode_msg(client.io.readline())
+    assert action == '_bin'
+    assert client._read_binary(ident, data)[2][0] == list(mod.value)
+
+    # only the requested formats
+    srv.dispatcher.handle_request(conn, (BINARYREQUEST, None, ['f8', 'xyz']))
+    assert conn.binary == ('f8',)
+    with pytest.raises(ProtocolError):
+        srv.dispatcher.handle_request(conn, (BINARYREQUEST, None, 'f8'))
+    conn.supports_binary = False
+    with pytest.raises(ProtocolError):
+        srv.dispatcher.handle_request(conn, (BINARYREQUEST, None, None))
+
+
+@pytest.mark.parametrize('data', [
+    b'_bin mod:_image {"format": "blob", "size": 3}\n\x00\x01\nupdate mod:_other [null, {}]\n',
+    b'_bin mod:_image {"format": "blob", "size": 30}\n\x00\x01\n',  # truncated
+    b'_bin mod:_value {"format": "f8", "size": 3}\n\x00\x01\nupdate mod:_value [null, {}]\n',
+])
+def test_binary_error(data):
+    client = SecopClient('')
+    client.activate = False
+    client.io = io = IOStub(data + b'update mod:value [1, {}]\n')
+    client._running = True
+    client._SecopClient__rxthread()
+    # the connection is closed, instead of reading on
+    assert io.data in (b'update mod:value [1, {}]\n', b'')
+    assert client.io is None
+    assert not client._running
+    assert client.state == 'disconnected'
+
+
+def test_reset():
+    dispatcher = Server().dispatcher
+    conn = Connection(dispatcher)
+    dispatcher.handle_request(conn, (BINARYREQUEST, None, None))
+    assert conn.binary
+    # reset by the identification request
+    dispatcher.handle_request(conn, (IDENTREQUEST, None, None))
+    assert conn.binary == ()
@@ -0,0 +1,161 @@
+# *****************************************************************************
+#
+# This program is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+# *****************************************************************************
+"""test the handling of the descriptive data in the client"""
+
+import copy
+import json
+import socket
+import threading
+
+from frappy.client import SecopClient, cached_datatype
+from frappy.protocol.messages import IDENTREPLY
+from frappy.protocol.router import SecopClient as RouterClient
+
+
+def make_description(nmodules=3):
+    return {
+        'equipment_id': 'node', 'description': 'a node',
+        'modules': {f'mod{i}': {
+            'description': 'a module',
+            'interface_classes': ['Readable'],
+            'accessibles': {
+                'value': {'description': 'the value', 'readonly': True,
+                          'datainfo': {'type': 'double', 'unit': 'K'}},
+                'status': {'description': 'the status', 'readonly': True,
+                           'datainfo': {'type': 'tuple', 'members': [
+                               {'type': 'enum', 'members': {'IDLE': 100, 'ERROR': 400}},
+                               {'type': 'string'}]}},
+                'mode': {'description': 'the mode', 'readonly': False,
+                         'datainfo': {'type': 'enum', 'members': {'off': 0, 'on': 1}}},
+                'stop': {'description': 'stop it',
+                         'datainfo': {'type': 'command'}},
+            },
+        } for i in range(nmodules)},
+    }
+
+
+def test_cached_datatype():
+    dt = cached_datatype({'type': 'double', 'unit': 'K'})
+    assert cached_datatype({'unit': 'K', 'type': 'double'}) is dt
+    assert cached_datatype({'type': 'double', 'unit': 'mK'}) is not dt
+    # enums are named after the parameter
+    enum = cached_datatype({'type': 'enum', 'members': {'off': 0, 'on': 1}}, 'mode')
+    assert cached_datatype({'type': 'enum', 'members': {'off': 0, 'on': 1}}, 'mode') is enum
+    other = cached_datatype({'type': 'enum', 'members': {'off': 0, 'on': 1}}, 'other')
+    assert other is not enum
+    assert other.export_value(other('on')) == 1
+
+
+class Client(SecopClient):
+    def __init__(self):
+        super().__init__('', log=None)
+        self.changes = []
+        for key in None, 'mod0', 'mod1', 'mod2':
+            self.register_callback(key, descriptiveDataChange=self.changed)
+
+    def changed(self, module, client):
+        self.changes.append(module)
+
+
+def test_init_descriptive_data():
+    c1 = Client()
+    c1._init_descriptive_data(make_description())
+    assert c1.changes == []
+    assert c1.properties == {'equipment_id': 'node', 'description': 'a node'}
+    assert c1.internal['mod1:value'] == ('mod1', 'value')
+    assert c1.identifier['mod2', 'stop'] == 'mod2:stop'
+    assert set(c1.modules['mod0']['commands']) == {'stop'}
+    dt = c1.modules['mod0']['parameters']['value']['datatype']
+    # datatypes are shared between modules and clients
+    assert c1.modules['mod1']['parameters']['value']['datatype'] is dt
+    c2 = Client()
+    c2._init_descriptive_data(make_description())
+    assert c2.modules['mod2']['parameters']['value']['datatype'] is dt
+
+    # reconnect with the same description: unchanged modules are kept
+    mod0 = c1.modules['mod0']
+    c1._init_descriptive_data(make_description())
+    assert c1.changes == []
+    assert c1.modules['mod0'] is mod0
+
+    description = make_description()
+    description['modules']['mod1']['accessibles']['value']['datainfo']['unit'] = 'mK'
+    del description['modules']['mod2']
+    c1._init_descriptive_data(description)
+    assert c1.modules['mod0'] is mod0
+    assert c1.modules['mod1']['parameters']['value']['datatype'].unit == 'mK'
+    assert 'mod2:value' not in c1.internal
+    assert c1.changes[0] is None
+    assert set(c1.changes[1:]) == {'mod1', 'mod2'}
+
+    c1.changes = []
+    description = copy.deepcopy(description)
+    description['description'] = 'another node'
+    c1._init_descriptive_data(description)
+    assert c1.changes == [None]
+    assert c1.properties['description'] == 'another node'
+
+
+class NodeStub:
+    """a SEC node not knowing the '_binary' request of frappy"""
+    def __init__(self):
+        self.sock = socket.create_server(('localhost', 0))
+        self.port = self.sock.getsockname()[1]
+        self.requests = []
+        self.thread = threading.Thread(target=self.serve)
+        self.thread.start()
+
+    def serve(self):
+        conn, _ = self.sock.accept()
+        with conn:
+            rfile = conn.makefile('rb')
+            for line in rfile:
+                request = line.decode().strip()
+                self.requests.append(request)
+                if request == '*IDN?':
+                    reply = IDENTREPLY
+                elif request == '_binary':
+                    reply = 'error__binary  ["BadValue", "unknown request", {}]'
+                elif request == 'describe':
+                    reply = f'describing . {json.dumps(make_description(1))}'
+                else:
+                    reply = 'error_x  ["NoSuchCommand", "x", {}]'
+                conn.sendall(reply.encode() + b'\n')
+                if request == 'describe':
+                    return
+
+
+def test_binary_transfer():
+    assert not SecopClient.binary_transfer
+    assert not RouterClient.binary_transfer
+    node = NodeStub()
+
+    class BinaryClient(SecopClient):
+        activate = False
+        binary_transfer = True
+
+    client = BinaryClient(f'localhost:{node.port}')
+    try:
+        # an error reply to '_binary' does not make the connect fail
+        client.connect()
+        assert node.requests == ['*IDN?', '_binary', 'describe']
+        assert 'mod0' in client.modules
+    finally:
+        client.disconnect()
+        node.thread.join(5)
+        node.sock.close()
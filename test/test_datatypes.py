@@ -22,11 +22,13 @@
 
 
 # no fixtures needed
+import sys
+
 import pytest
 
 from frappy.datatypes import ArrayOf, BLOBType, BoolType, CommandType, \
     ConfigError, DataType, EnumType, FloatRange, \
-    IntRange, ProgrammingError, ScaledInteger, StatusType, StringType, \
+    IntRange, NumpyArrayOf, ProgrammingError, ScaledInteger, StatusType, StringType, \
     StructOf, TextType, TupleOf, ValueType, get_datatype
 from frappy.errors import BadValueError, RangeError, WrongTypeError
 from frappy.lib import generalConfig
@@ -375,6 +377,77 @@ def test_ArrayOf():
     assert dt.to_string(dt([[1, 2]])) == "[['a', 'b']]"
 
 
+def test_ArrayOf_float():
+    # the specialized conversion of float arrays
+    dt = ArrayOf(FloatRange(), 0, 10)
+    result = dt([1, 2.5, True])
+    assert result == (1.0, 2.5, 1.0)
+    assert all(isinstance(v, float) for v in result)
+    assert dt([float('inf'), -float('inf')]) == (sys.float_info.max, -sys.float_info.max)
+    with pytest.raises(WrongTypeError):
+        dt([1, '2'])
+    assert dt.export_value((1, 2)) == [1.0, 2.0]
+    assert dt.import_value([1, 2]) == (1.0, 2.0)
+    with pytest.raises(WrongTypeError):
+        dt.import_value(['1'])
+
+
+@pytest.mark.parametrize('value', [[1j, 2], [2, 1 + 0j], [1.5, None], [b'1']])
+def test_ArrayOf_float_not_real(value):
+    # the specialized conversion rejects what FloatRange rejects
+    with pytest.raises(WrongTypeError):
+        ArrayOf(FloatRange())(value)
+
+
+def test_ArrayOf_numpy():
+    numpy = pytest.importorskip('numpy')
+    dt = ArrayOf(FloatRange(), 0, 10)
+    result = dt(numpy.array([1, 2, numpy.inf]))
+    assert result == (1.0, 2.0, sys.float_info.max)
+    assert isinstance(result[0], float)
+    with pytest.raises(WrongTypeError):
+        dt(numpy.array(['1', '2']))
+    with pytest.raises(RangeError):
+        dt(numpy.zeros(11))
+    # numpy scalars in a list are converted one by one
+    assert dt([numpy.float32(1.5), numpy.int64(2)]) == (1.5, 2.0)
+
+
+def test_NumpyArrayOf():
+    numpy = pytest.importorskip('numpy')
+    dt = NumpyArrayOf(FloatRange(-10, 10), 0, 5)
+    copytest(dt)
+    assert dt.export_datatype() == ArrayOf(FloatRange(-10, 10), 0, 5).export_datatype()
+    value = dt([1, 2, float('inf')])
+    assert value == (1, 2, sys.float_info.max)
+    assert value != [1, 2, 3]
+    assert dt(value) is value
+    with pytest.raises(ValueError):
+        value[0] = 5  # read only
+    assert dt.export_value(value) == [1.0, 2.0, sys.float_info.max]
+    assert isinstance(dt.export_value(value)[0], float)
+    assert dt.import_value([1, 2]) == (1.0, 2.0)
+    assert dt.validate(numpy.array([-10, 10])) == (-10, 10)
+    with pytest.raises(RangeError):
+        dt.validate([1, 11])
+    with pytest.raises(RangeError):
+        dt(range(6))
+    with pytest.raises(WrongTypeError):
+        dt(['1', '2'])
+    with pytest.raises(WrongTypeError):
+        dt([[1, 2]])
+    assert len(dt([])) == 0
+
+    dt = NumpyArrayOf(IntRange(0, 100), 0, 5)
+    assert dt([1, 2.0, True]).dtype == numpy.int64
+    with pytest.raises(WrongTypeError):
+        dt([1.5])
+    with pytest.raises(RangeError):
+        dt.validate([101])
+    with pytest.raises(ProgrammingError):
+        NumpyArrayOf(StringType())
+
+
 def test_TupleOf():
     # test constructor catching illegal arguments
     with pytest.raises(ProgrammingError):
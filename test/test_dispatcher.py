@@ -0,0 +1,290 @@
+# *****************************************************************************
+#
+# This program is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+# *****************************************************************************
+"""test the dispatcher"""
+
+import threading
+import time
+
+import pytest
+
+from frappy.protocol.dispatcher import Dispatcher
+from frappy.secnode import SecNode
+from frappy.datatypes import FloatRange
+from frappy.errors import ConfigError, NoSuchModuleError, ProtocolError
+from frappy.lib import generalConfig
+from frappy.modules import Readable
+from frappy.params import Parameter
+from frappy.poller import PollInfo, PollLoad
+from frappy.protocol.messages import DESCRIPTIONREPLY, ERRORPREFIX, EVENTREPLY, \
+    HEARTBEATREQUEST, POLLSTATSREPLY, POLLSTATSREQUEST, READMANYREPLY, \
+    READMANYREQUEST, READREPLY, READREQUEST, WRITEREQUEST
+
+
+class LoggerStub:
+    def debug(self, fmt, *args):
+        print(fmt % args)
+    info = warning = exception = error = debug
+    handlers = []
+
+
+class ParamStub:
+    def __init__(self, export):
+        self.export = export
+
+
+class ModuleStub:
+    io = None
+
+    def __init__(self, name, *pnames):
+        self.name = name
+        self.parameters = {p: ParamStub(p) for p in pnames}
+
+    def setRemoteLogging(self, conn, level, send_log):
+        pass
+
+
+class SecNodeStub:
+    def __init__(self, *modules):
+        self.modules = {m.name: m for m in modules}
+        self.export = list(self.modules)
+
+
+class ServerStub:
+    restart = None
+    shutdown = None
+
+    def __init__(self, *modules):
+        self.secnode = SecNodeStub(*modules)
+
+
+class Connection:
+    def __init__(self, dispatcher):
+        self.result = []
+        dispatcher.add_connection(self)
+
+    def send_reply(self, msg):
+        self.result.append(msg[1])
+
+
+@pytest.fixture(name='dispatcher')
+def dispatcher_():
+    return Dispatcher('', LoggerStub(), {}, ServerStub(
+        ModuleStub('m1', 'value', 'target'), ModuleStub('m2', 'value', 'status')))
+
+
+def events(dispatcher):
+    for spec in 'm1:value', 'm1:target', 'm2:value', 'm2:status':
+        dispatcher.broadcast_event((EVENTREPLY, spec, [0, {}]))
+
+
+def test_routing(dispatcher):
+    c1, c2, c3 = [Connection(dispatcher) for _ in range(3)]
+    dispatcher.subscribe(c1, 'm1')
+    dispatcher.subscribe(c2, 'm2:status')
+    dispatcher.activate_all(c3)
+    events(dispatcher)
+    assert c1.result == ['m1:value', 'm1:target']
+    assert c2.result == ['m2:status']
+    assert len(c3.result) == 4
+
+    for c in c1, c2, c3:
+        c.result.clear()
+    dispatcher.unsubscribe(c1, 'm1')
+    dispatcher.subscribe(c1, 'm1:target')
+    dispatcher.deactivate_all(c3)
+    dispatcher.subscribe(c3, 'm2')
+    events(dispatcher)
+    assert c1.result == ['m1:target']
+    assert c2.result == ['m2:status']
+    assert c3.result == ['m2:value', 'm2:status']
+
+    for c in c1, c2, c3:
+        c.result.clear()
+    dispatcher.remove_connection(c3)
+    dispatcher.reset_connection(c1)
+    events(dispatcher)
+    assert not c1.result
+    assert c2.result == ['m2:status']
+    assert not c3.result
+    assert dispatcher._routes == {('m2', 'status'): (c2,)}
+
+
+@pytest.mark.parametrize('locking', ['node', 'module', 'io'])
+def test_request_locking(locking):
+    io = ModuleStub('io')
+    m1, m2, m3 = ModuleStub('m1'), ModuleStub('m2'), ModuleStub('m3')
+    m1.io = m2.io = io
+    dispatcher = Dispatcher('', LoggerStub(), {'request_locking': locking}, ServerStub(io, m1, m2, m3))
+    lock = dispatcher._request_lock
+    # requests without module are serialized with the node lock
+    assert lock(HEARTBEATREQUEST, 'nonce') is dispatcher._lock
+    assert lock(READREQUEST, 'unknown:value') is dispatcher._lock
+    assert lock(READREQUEST, 'm1:value') is lock(WRITEREQUEST, 'm1')
+    if locking == 'node':
+        assert lock(READREQUEST, 'm1:value') is dispatcher._lock
+        assert lock(READREQUEST, 'm3:value') is dispatcher._lock
+        return
+    assert lock(READREQUEST, 'm1:value') is not dispatcher._lock
+    assert lock(READREQUEST, 'm1:value') is not lock(READREQUEST, 'm3:value')
+    if locking == 'io':
+        assert lock(READREQUEST, 'm1:value') is lock(READREQUEST, 'm2:value')
+        assert lock(READREQUEST, 'm1:value') is lock(READREQUEST, 'io')
+    else:
+        assert lock(READREQUEST, 'm1:value') is not lock(READREQUEST, 'm2:value')
+
+
+def test_bad_locking():
+    with pytest.raises(ConfigError):
+        Dispatcher('', LoggerStub(), {'request_locking': 'xxx'}, ServerStub())
+
+
+class Server:
+    restart = shutdown = None
+
+    def __init__(self):
+        self.secnode = SecNode('node', LoggerStub(), {}, self)
+        self.dispatcher = Dispatcher('', LoggerStub(), {}, self)
+
+
+def test_describe_cache():
+    generalConfig.testinit()
+
+    class Mod(Readable):
+        value = Parameter('', FloatRange(unit='mA'))
+        extra = Parameter('', FloatRange(), default=0)
+
+    srv = Server()
+    mod = Mod('mod', LoggerStub(), {'description': ''}, srv)
+    srv.secnode.add_module(mod, 'mod')
+    reply = srv.dispatcher.handle_describe(None, 'mod', None)
+    assert reply[0] == DESCRIPTIONREPLY
+    assert reply[2]['accessibles']['value']['datainfo']['unit'] == 'mA'
+    frame = reply.frame
+    # unchanged description: the same reply with the encoded frame is returned
+    assert srv.dispatcher.handle_describe(None, 'mod', None) is reply
+    assert srv.dispatcher.handle_describe(None, 'mod:value', None) is not reply
+    mod.parameters['value'].datatype.setProperty('unit', 'A')
+    reply = srv.dispatcher.handle_describe(None, 'mod', None)
+    assert reply[2]['accessibles']['value']['datainfo']['unit'] == 'A'
+    assert reply.frame != frame
+
+
+def test_readmany():
+    generalConfig.testinit()
+
+    class Mod(Readable):
+        value = Parameter('', FloatRange())
+
+        def read_value(self):
+            return 1.5
+
+        def read_status(self):
+            raise ValueError('bad status')
+
+    srv = Server()
+    mod = Mod('mod', LoggerStub(), {'description': ''}, srv)
+    srv.secnode.add_module(mod, 'mod')
+    conn = Connection(srv.dispatcher)
+    srv.dispatcher.activate_all(conn)
+    action, _, result = srv.dispatcher.handle_request(
+        conn, (READMANYREQUEST, None, ['mod:value', 'mod:status', 'mod:xxx']))
+    assert action == READMANYREPLY
+    assert [r[0:2] for r in result] == [[READREPLY, 'mod:value'],
+                                        [ERRORPREFIX + READREQUEST, 'mod:status'],
+                                        [ERRORPREFIX + READREQUEST, 'mod:xxx']]
+    assert result[0][2][0] == 1.5
+    assert result[1][2][0] == 'InternalError'
+    assert result[2][2][0] == 'NoSuchParameter'
+    # the update events are sent as for single reads
+    assert conn.result == ['mod:value', 'mod:status']
+    with pytest.raises(ProtocolError):
+        srv.dispatcher.handle_request(conn, (READMANYREQUEST, None, 'mod:value'))
+
+
+@pytest.mark.parametrize('locking', ['module', 'io'])
+def test_readmany_locking(locking):
+    generalConfig.testinit()
+    release = threading.Event()
+    reading = threading.Event()
+
+    class Mod(Readable):
+        value = Parameter('', FloatRange())
+        slow = False
+
+        def read_value(self):
+            if self.slow:
+                reading.set()
+                release.wait(5)
+            return 1.5
+
+        def read_status(self):
+            return 'IDLE', ''
+
+    srv = Server()
+    srv.dispatcher = Dispatcher('', LoggerStub(), {'request_locking': locking}, srv)
+    slow = Mod('slow', LoggerStub(), {'description': ''}, srv)
+    slow.slow = True
+    srv.secnode.add_module(slow, 'slow')
+    srv.secnode.add_module(Mod('other', LoggerStub(), {'description': ''}, srv), 'other')
+    conn = Connection(srv.dispatcher)
+    # a _readmany blocked on one module does not block other requests
+    thread = threading.Thread(target=srv.dispatcher.handle_request,
+                              args=(conn, (READMANYREQUEST, None, ['slow:value'])))
+    thread.start()
+    assert reading.wait(5)
+    result = []
+    other = threading.Thread(target=lambda: result.append(srv.dispatcher.handle_request(
+        conn, (READMANYREQUEST, None, ['other:value']))))
+    other.start()
+    other.join(1)
+    release.set()
+    thread.join(5)
+    assert result and result[0][2][0][2][0] == 1.5
+    other.join()
+
+
+def test_pollstats():
+    generalConfig.testinit()
+
+    class Mod(Readable):
+        value = Parameter('', FloatRange())
+
+        def read_value(self):
+            return 1.5
+
+        def read_status(self):
+            raise ValueError('bad status')
+
+    srv = Server()
+    mod = Mod('mod', LoggerStub(), {'description': ''}, srv)
+    srv.secnode.add_module(mod, 'mod')
+    mod.pollInfo = PollInfo(5, threading.Event())
+    mod.pollInfo.load = PollLoad('io')
+    mod.callPollFunc(mod.read_value, due=time.time() - 1)
+    mod.callPollFunc(mod.read_status)
+    action, _, result = srv.dispatcher.handle_request(None, (POLLSTATSREQUEST, 'mod', None))
+    assert action == POLLSTATSREPLY
+    stats = result['modules']['mod']
+    assert stats['read_value']['count'] == 1
+    assert stats['read_value']['mean_lateness'] >= 1
+    assert stats['read_status']['errors'] == 1
+    assert 'mean_lateness' not in stats['read_status']
+    assert result['pollers']['io']['modules'] == ['mod']
+    assert 0 < result['pollers']['io']['load'] <= 1
+    with pytest.raises(NoSuchModuleError):
+        srv.dispatcher.handle_request(None, (POLLSTATSREQUEST, 'xxx', None))
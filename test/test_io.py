@@ -22,15 +22,22 @@
 
 import time
 import pytest
-from frappy.io import StringIO
+from frappy.io import PushSource, StringIO
+from frappy.lib.prioritylock import high_priority
+from frappy.poller import PollInfo
 
 
 class Time:
-    def __init__(self, items):
+    def __init__(self, items, now=1000):
         self.items = items
+        self.now = now
+
+    def time(self):
+        return self.now
 
     def sleep(self, seconds):
         self.items.append(seconds)
+        self.now += seconds
 
 
 class IO(StringIO):
@@ -96,3 +103,60 @@ def test_multicomm_with_delay(monkeypatch):
     monkeypatch.setattr(time, 'sleep', tm.sleep)
     assert io.multicomm([('noreply', False, 1), ('reply', True, 2)]) == ['REPLY']
     assert io.items == ['noreply', 1, 'reply', 2]
+
+
+def test_max_rate(monkeypatch):
+    io = IO()
+    io.max_rate = 2
+    tm = Time([])
+    monkeypatch.setattr(time, 'time', tm.time)
+    monkeypatch.setattr(time, 'sleep', tm.sleep)
+    # the budget is full after a long pause: two communications within one second
+    io.useBudget()
+    io.useBudget()
+    assert tm.now == 1000
+    # no budget left for slow polls
+    assert io.slowPollDelay() == 0.75
+    io.useBudget()
+    assert tm.now == 1000.5
+    tm.now += 1
+    assert io.slowPollDelay() == 0
+    io.max_rate = 0
+    io.useBudget()
+    assert io.slowPollDelay() == 0
+    assert tm.now == 1001.5
+    # client requests do not wait
+    io.max_rate = 2
+    io.useBudget()
+    io.useBudget()
+    with high_priority():
+        io.useBudget()
+    assert tm.now == 1001.5
+    assert io.slowPollDelay() == 0.75
+
+
+class PushIO(PushSource, IO):
+    pass
+
+
+class PushTarget:
+    def __init__(self):
+        self.pollInfo = PollInfo(1, None)
+        self.frames = []
+
+
+def test_push(monkeypatch):
+    io = PushIO()
+    io.push_timeout = 10
+    tm = Time([])
+    monkeypatch.setattr(time, 'time', tm.time)
+    target = PushTarget()
+    io.registerPushTarget('chan1', target, target.frames.append, ['a', 'b'])
+    io.registerPushTarget('c', target, target.frames.append)
+    assert io.deliverPush('chan1', 'frame1')
+    assert not io.deliverPush('chan2', 'frame2')
+    assert target.frames == ['frame1']
+    assert target.pollInfo.push_until == {'a': 1010, 'b': 1010}
+    tm.now += 1
+    assert io.deliverPush('c', 'frame3')
+    assert target.pollInfo.push_until == {'a': 1010, 'b': 1010, 'c': 1011}
@@ -0,0 +1,93 @@
+# *****************************************************************************
+#
+# This program is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+# *****************************************************************************
+"""test the json codec"""
+
+import json
+import math
+
+import pytest
+
+from frappy.lib import jsoncodec
+
+UPDATE = [1.2345678901234, {'t': 1700000000.123456, 'e': 0.001}]
+
+DESCRIBING = {
+    'equipment_id': 'bench', 'description': 'a node with 20 modules',
+    'modules': {f'mod{i}': {
+        'description': 'a module with some parameters, and some unicode: °C',
+        'interface_classes': ['Drivable'],
+        'accessibles': {p: {
+            'description': f'parameter {p}', 'readonly': p != 'target',
+            'datainfo': {'type': 'double', 'min': -1e5, 'max': 1e5, 'unit': 'K'},
+        } for p in ('value', 'status', 'target', 'ramp', 'pollinterval')},
+    } for i in range(20)},
+}
+
+SAMPLES = [UPDATE, DESCRIBING, 'text/with "quotes"', [1e16, 1e-5, 2**70, -0.0],
+           {'nan': float('nan'), 'inf': float('inf')}, None, True]
+
+
+def available_codecs():
+    result = []
+    for name in jsoncodec.CODECS:
+        try:
+            jsoncodec.CODECS[name]()
+            result.append(name)
+        except ImportError:
+            pass
+    return result
+
+
+@pytest.fixture(name='codec', params=available_codecs())
+def codec_(request):
+    previous = jsoncodec.codec
+    yield jsoncodec.select_codec(request.param)
+    jsoncodec.select_codec(previous)
+
+
+@pytest.mark.parametrize('sample', SAMPLES)
+def test_codec(codec, sample):
+    text = json.dumps(sample)
+    assert jsoncodec.dumps(sample) == text
+    decoded = jsoncodec.loads(text)
+    # compare the text, as nan != nan
+    assert json.dumps(decoded) == text
+
+
+def test_nan(codec):
+    assert math.isnan(jsoncodec.loads('[NaN]')[0])
+    with pytest.raises(ValueError):
+        jsoncodec.loads('[1,')
+
+
+@pytest.mark.parametrize('value', [2**64, -2**63 - 1, 10**30, 2**63 - 1])
+def test_big_int(codec, value):
+    decoded = jsoncodec.loads(json.dumps({'maxchars': value, 'x': [value]}))
+    assert decoded == {'maxchars': value, 'x': [value]}
+    assert type(decoded['maxchars']) is int
+
+
+def test_exact_keys(codec):
+    text = json.dumps({'max': 2**64})
+    key = ('describing', '.')
+    assert jsoncodec.loads(text, key) == {'max': 2**64}
+    if codec == 'orjson':
+        # the next message with this key goes to the standard library directly
+        assert key in jsoncodec.exact_keys
+    assert jsoncodec.loads(json.dumps(UPDATE), key) == UPDATE
+    assert jsoncodec.loads(text, key) == {'max': 2**64}
@@ -23,7 +23,8 @@
 import pytest
 
 import frappy.protocol.messages as m
-from frappy.protocol.interface import decode_msg, encode_msg_frame
+from frappy.protocol.interface import EncodedMessage, MessageBuffer, \
+    decode_msg, encode_msg_frame
 
 # args are: msg tuple, msg bytes
 MSG = [
@@ -49,3 +50,30 @@ def test_encode(msg, line):
 @pytest.mark.parametrize('msg, line', MSG)
 def test_decode(msg, line):
     assert decode_msg(line) == msg
+
+
+@pytest.mark.parametrize('msg, line', MSG)
+def test_encoded_message(msg, line):
+    encoded = EncodedMessage(*msg)
+    assert encoded == msg
+    assert encoded.frame == encode_msg_frame(*msg)
+    assert encoded.text == line.decode('utf-8')
+    # the frame is cached
+    assert encoded.frame is encoded.frame
+
+
+@pytest.mark.parametrize('chunksize', [1, 7, 1000])
+def test_message_buffer(chunksize):
+    lines = [line for _, line in MSG] + [b'', b'change mod:spectrum [%s]' % b', '.join([b'1.5'] * 10000)]
+    data = b''.join(line + b'\n' for line in lines) + b'incomplete'
+    buffer = MessageBuffer()
+    result = []
+    for pos in range(0, len(data), chunksize):
+        buffer.ingest(data[pos:pos + chunksize])
+        while True:
+            msg = buffer.get_msg()
+            if msg is None:
+                break
+            result.append(msg)
+    assert result == lines
+    assert bytes(buffer.data[buffer.start:]) == b'incomplete'
@@ -0,0 +1,177 @@
+# *****************************************************************************
+#
+# This program is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+# *****************************************************************************
+"""test output queues of connections"""
+
+import threading
+
+import pytest
+
+from frappy.errors import ConfigError
+from frappy.protocol.messages import EVENTREPLY, READREPLY
+from frappy.protocol.outqueue import OutputQueue
+
+
+class LoggerStub:
+    def debug(self, fmt, *args):
+        print(fmt % args)
+    info = warning = exception = error = debug
+
+
+class SlowConnection:
+    """a connection blocking in send_reply until released"""
+    def __init__(self):
+        self.result = []
+        self.release = threading.Event()
+        self.sending = threading.Event()
+        self.done = threading.Event()
+        self.running = True
+
+    def send_reply(self, msg):
+        self.sending.set()
+        self.release.wait(5)
+        self.result.append(msg)
+        if msg[0] == 'end':
+            self.done.set()
+
+    def close(self):
+        self.running = False
+
+
+def fill(outqueue, conn):
+    # the first message is taken by the writer, blocking in send_reply
+    outqueue.put((EVENTREPLY, 'mod:first', [0, {}]))
+    assert conn.sending.wait(5)
+    outqueue.put((EVENTREPLY, 'mod:a', [1, {}]))
+    outqueue.put((EVENTREPLY, 'mod:b', [1, {}]))
+    outqueue.put((READREPLY, 'mod:a', [1, {}]))
+
+
+def test_coalesce():
+    conn = SlowConnection()
+    outqueue = OutputQueue(conn, 3, 'coalesce', LoggerStub())
+    fill(outqueue, conn)
+    outqueue.put((EVENTREPLY, 'mod:b', [2, {}]))  # replaces pending 'mod:b'
+    outqueue.put((EVENTREPLY, 'mod:b', [3, {}]))  # replaces pending 'mod:b'
+    assert len(outqueue.queue) == 3
+    # beyond maxlen, but no update is dropped
+    for i in range(20):
+        outqueue.put((EVENTREPLY, f'mod:p{i}', [i, {}]))
+        outqueue.put((EVENTREPLY, f'mod:p{i}', [i + 1, {}]))
+    assert outqueue.statistics() == {'coalesced': 22}
+    outqueue.put(('end', None, None))
+    conn.release.set()
+    assert conn.done.wait(5)
+    assert [(m[0], m[1], m[2] and m[2][0]) for m in conn.result] == [
+        (EVENTREPLY, 'mod:first', 0),
+        (EVENTREPLY, 'mod:a', 1),
+        (EVENTREPLY, 'mod:b', 3),
+        (READREPLY, 'mod:a', 1),
+    ] + [(EVENTREPLY, f'mod:p{i}', i + 1) for i in range(20)] + [
+        ('end', None, None),
+    ]
+    outqueue.close()
+
+
+def test_coalesce_order():
+    # an update must not be moved before a reply queued earlier
+    conn = SlowConnection()
+    outqueue = OutputQueue(conn, 3, 'coalesce', LoggerStub())
+    outqueue.put((EVENTREPLY, 'mod:first', [0, {}]))
+    assert conn.sending.wait(5)
+    outqueue.put((EVENTREPLY, 'mod:a', [1, {}]))
+    outqueue.put((READREPLY, 'mod:a', [2, {}]))
+    outqueue.put((EVENTREPLY, 'mod:a', [3, {}]))
+    outqueue.put((EVENTREPLY, 'mod:a', [4, {}]))  # replaces 3
+    outqueue.put(('end', None, None))
+    conn.release.set()
+    assert conn.done.wait(5)
+    assert [(m[0], m[1], m[2] and m[2][0]) for m in conn.result] == [
+        (EVENTREPLY, 'mod:first', 0),
+        (READREPLY, 'mod:a', 2),
+        (EVENTREPLY, 'mod:a', 4),
+        ('end', None, None),
+    ]
+    assert outqueue.statistics() == {'coalesced': 2}
+    outqueue.close()
+
+
+def test_disconnect():
+    conn = SlowConnection()
+    outqueue = OutputQueue(conn, 3, 'disconnect', LoggerStub())
+    fill(outqueue, conn)
+    outqueue.put((EVENTREPLY, 'mod:b', [2, {}]))
+    outqueue.put((EVENTREPLY, 'mod:b', [3, {}]))
+    assert conn.running
+    outqueue.put((EVENTREPLY, 'mod:a', [2, {}]))
+    assert not conn.running
+    assert not outqueue.running
+    conn.release.set()
+
+
+def test_coalesce_full():
+    # replies and log messages can not be coalesced: the queue is still bounded
+    conn = SlowConnection()
+    outqueue = OutputQueue(conn, 3, 'coalesce', LoggerStub())
+    outqueue.put((EVENTREPLY, 'mod:first', [0, {}]))
+    assert conn.sending.wait(5)
+    for i in range(3):
+        outqueue.put((READREPLY, 'mod:a', [i, {}]))
+    outqueue.put(('log', 'mod:debug', 'message'))
+    assert not conn.running
+    assert not outqueue.running
+    conn.release.set()
+
+
+@pytest.mark.parametrize('overflow', ['disconnect', 'block'])
+def test_activate(overflow):
+    # the initial updates after activate do not overflow the queue
+    conn = SlowConnection()
+    outqueue = OutputQueue(conn, 5, overflow, LoggerStub())
+    outqueue.put((EVENTREPLY, 'mod:first', [0, {}]))
+    assert conn.sending.wait(5)
+    for i in range(20):
+        outqueue.put((EVENTREPLY, f'mod:p{i}', [i, {}]))
+    outqueue.put(('end', None, None))
+    assert conn.running
+    conn.release.set()
+    assert conn.done.wait(5)
+    assert len(conn.result) == 22
+    outqueue.close()
+
+
+def test_block():
+    conn = SlowConnection()
+    outqueue = OutputQueue(conn, 3, 'block', LoggerStub())
+    fill(outqueue, conn)
+    outqueue.put((EVENTREPLY, 'mod:a', [2, {}]))
+    outqueue.put((EVENTREPLY, 'mod:b', [2, {}]))
+    blocked = threading.Thread(target=outqueue.put, args=(('end', None, None),))
+    blocked.start()
+    blocked.join(0.1)
+    assert blocked.is_alive()
+    conn.release.set()
+    assert conn.done.wait(5)
+    assert [(m[1], m[2] and m[2][0]) for m in conn.result] == [
+        ('mod:first', 0), ('mod:a', 1), ('mod:b', 1), ('mod:a', 1),
+        ('mod:a', 2), ('mod:b', 2), (None, None)]
+    outqueue.close()
+
+
+def test_bad_policy():
+    with pytest.raises(ConfigError):
+        OutputQueue(SlowConnection(), 3, 'drop', LoggerStub())
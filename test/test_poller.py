@@ -31,6 +31,8 @@ import pytest
 from frappy.core import Module, Parameter, FloatRange, Readable, ReadHandler, nopoll
 from frappy.lib.multievent import MultiEvent
 from frappy.lib import generalConfig
+from frappy.poller import Poller, PollInfo, PollPool, PollScheduler, \
+    PollStats, PollWatchdog, StartupLimiter, gateway_host
 
 
 class Time:
@@ -155,3 +157,358 @@ def test_poll(ncycles, pollinterval, slowinterval, mspan, pspan, monkeypatch):
                 lowcnt += 1
             assert t2 - t1 <= pspan[1]
         assert lowcnt <= 2
+
+
+class PollModStub:
+    def __init__(self, nparams, pollinterval=5, slowinterval=15):
+        self.slowinterval = slowinterval
+        self.pollInfo = PollInfo(pollinterval, threading.Event())
+        self.params = [type('PObj', (), {'timestamp': 0, 'name': f'p{i}'})() for i in range(nparams)]
+        for i, pobj in enumerate(self.params):
+            def rfunc():
+                pass
+            rfunc.__name__ = f'read_p{i}'
+            self.pollInfo.polled_parameters.append((self, rfunc, pobj))
+
+    def doPoll(self):
+        pass
+
+
+def test_scheduler():
+    sched = PollScheduler()
+    mod = PollModStub(6)
+    pinfo = mod.pollInfo
+    sched.add_module(mod, 1001)
+    # slow polls are spread over 3 slots aligned with the poll interval
+    assert sorted(pinfo.due.values()) == [1000, 1000, 1001, 1005, 1005, 1010, 1010]
+    assert sched.pop_main(1001) is mod
+    assert sched.pop_main(1001) is None
+    pinfo.last_main = 1000
+    sched.push_main(mod, 1001)
+    assert pinfo.due['doPoll'] == 1005
+    assert [(f.__name__, due) for _, f, due in (sched.pop_slow(1001) for _ in range(2))] == [
+        ('read_p0', 1000), ('read_p1', 1000)]
+    assert sched.pop_slow(1001) is None
+    assert sched.next_due() == 1005
+    # recently updated parameters are skipped
+    mod.params[2].timestamp = 1000
+    assert sched.pop_slow(1006)[1].__name__ == 'read_p3'
+    assert pinfo.due['read_p2'] == pinfo.due['read_p3'] == 1020
+    # a triggered poll is due immediately
+    pinfo.trigger(True)
+    sched.update(1007)
+    assert sched.next_due() == 5
+    assert sched.pop_main(1007) is mod
+    # after a reconnect, all slow polls are due
+    pinfo.last_slow = 0
+    pinfo.trigger(True)
+    sched.update(1008)
+    assert sched.pop_main(1008) is mod
+    assert len([sched.pop_slow(1008) for _ in range(6)]) == 6
+    assert sched.pop_slow(1008) is None
+    # slow polls are suppressed while values are pushed
+    pinfo.push_until = {f'p{i}': 1100 for i in range(5)}
+    # p5 is not pushed, and still polled
+    assert sched.pop_slow(1030)[1].__name__ == 'read_p5'
+    assert sched.pop_slow(1030) is None
+    assert min(pinfo.due[f'read_p{i}'] for i in range(5)) > 1030  # rescheduled
+    assert sched.pop_slow(1101) is not None
+
+
+class PoolDispatcherStub:
+    def announce_update(self, moduleobj, pobj):
+        pass
+
+
+class PoolSecNodeStub:
+    startupLimiter = None
+    pollWatchdog = None
+
+    def __init__(self, nworkers):
+        self.pollPool = PollPool(nworkers, logging.getLogger('pollpool')) if nworkers else None
+
+
+class PoolServerStub:
+    def __init__(self, nworkers):
+        generalConfig.testinit()
+        self.dispatcher = PoolDispatcherStub()
+        self.secnode = PoolSecNodeStub(nworkers)
+
+
+class PoolMod(Module):
+    def __init__(self, name, srv):
+        super().__init__(name, logging.getLogger(name), {'description': '', 'pollinterval': 0.1}, srv)
+        self.polls = 0
+        self.busy = False
+        self.overlaps = 0
+        self.threads = set()
+
+    def doPoll(self):
+        if self.busy:
+            self.overlaps += 1
+        self.busy = True
+        self.threads.add(threading.current_thread())
+        time.sleep(0.01)
+        self.polls += 1
+        self.busy = False
+
+
+def test_pool():
+    srv = PoolServerStub(3)
+    modules = [PoolMod(f'mod{i}', srv) for i in range(10)]
+    start_events = MultiEvent()
+    for mobj in modules:
+        mobj.initModule()
+        mobj.startModule(start_events)
+    assert start_events.wait(5)
+    time.sleep(0.5)
+    threads = set()
+    for mobj in modules:
+        assert mobj.polls >= 2
+        assert mobj.overlaps == 0
+        threads.update(mobj.threads)
+    assert len(threads) <= 3
+
+
+class AdaptiveModStub:
+    pollinterval = 1
+    busy = False
+
+    def __init__(self):
+        self.parameters = {'value': type('PObj', (), {'datatype': FloatRange(absolute_resolution=0.01),
+                                                      'value': 0})()}
+
+    def isBusy(self):
+        return self.busy
+
+
+def test_adaptive():
+    mod = AdaptiveModStub()
+    pinfo = PollInfo(1, threading.Event())
+    pinfo.adapt(mod)
+    assert pinfo.interval == 1  # adaptive polling is off
+    pinfo.max_interval = 5
+    intervals = []
+    for value in 0, 0, 0.005, 0, 0, 0, 1, 1:
+        mod.parameters['value'].value = value
+        pinfo.adapt(mod)
+        intervals.append(pinfo.interval)
+    # changes within resolution are ignored
+    assert intervals == [1, 2, 4, 5, 5, 5, 1, 2]
+    mod.busy = True
+    pinfo.adapt(mod)
+    assert pinfo.interval == 1
+    mod.busy = False
+    pinfo.fast_flag = True
+    pinfo.interval = 0.25
+    pinfo.adapt(mod)
+    assert pinfo.interval == 0.25  # no adaption in fast poll mode
+
+
+def test_pollstats():
+    stats = PollStats()
+    for i in range(100):
+        stats.add(i * 0.01, 1 if i % 10 else None, i % 20 == 0)
+    result = stats.summary()
+    assert result['count'] == 100
+    assert result['errors'] == 5
+    assert result['max'] == pytest.approx(0.99)
+    assert result['p95'] == pytest.approx(0.94)
+    assert result['mean'] == pytest.approx(0.495)
+    assert result['mean_lateness'] == result['max_lateness'] == 1
+    stats.add(2, None, False)
+    assert stats.summary()['count'] == 101
+    assert stats.summary()['max'] == 2
+
+
+def test_gateway_host():
+    assert gateway_host('tcp://gateway:3001') == 'gateway'
+    assert gateway_host('gateway:3001') == 'gateway'
+    assert gateway_host('serial:///dev/ttyUSB0') is None
+    assert gateway_host('') is None
+
+
+class StartupMod(PoolMod):
+    lock = threading.Lock()
+    starting = {}  # host -> number of modules starting
+    max_starting = {}
+
+    def initialReads(self):
+        host = gateway_host(self.uri)
+        with self.lock:
+            self.starting[host] = self.starting.get(host, 0) + 1
+            self.max_starting[host] = max(self.max_starting.get(host, 0), self.starting[host])
+        time.sleep(0.05)
+        with self.lock:
+            self.starting[host] -= 1
+
+
+def test_startup_limit():
+    srv = PoolServerStub(0)
+    srv.secnode.startupLimiter = StartupLimiter(2)
+    modules = []
+    for i in range(6):
+        mobj = StartupMod(f'mod{i}', srv)
+        mobj.uri = f'tcp://gateway{i % 2}:{3000 + i}'
+        modules.append(mobj)
+    start_events = MultiEvent()
+    for mobj in modules:
+        mobj.initModule()
+        mobj.startModule(start_events)
+    assert start_events.wait(5)
+    assert StartupMod.max_starting == {'gateway0': 2, 'gateway1': 2}
+    for mobj in modules:
+        assert mobj.startupDuration >= 0.05
+
+
+class StuckMod(PoolMod):
+    param = Parameter('a parameter', FloatRange(), default=0)
+    slowinterval = 0.1
+    stuck = threading.Event()  # set while read_param is stuck
+    calls = 0
+
+    def read_param(self):
+        self.calls += 1
+        if self.calls == 2:
+            self.stuck.set()
+            time.sleep(0.5)
+            self.stuck.clear()
+        return self.calls
+
+
+def test_watchdog():
+    srv = PoolServerStub(0)
+    srv.secnode.pollWatchdog = PollWatchdog(0.1, 10, logging.getLogger('watchdog'))
+    mobj = StuckMod('stuck', srv)
+    mobj.initModule()
+    start_events = MultiEvent()
+    mobj.startModule(start_events)
+    assert start_events.wait(5)
+    assert mobj.stuck.wait(5)
+    time.sleep(0.3)
+    assert mobj.parameters['param'].readerror.name == 'TimeoutError'
+    while mobj.stuck.is_set():
+        time.sleep(0.05)
+    time.sleep(0.3)
+    # read_param is not called again within the backoff time
+    assert mobj.calls == 2
+    assert mobj.pollInfo.backoff['read_param'] > time.time() + 9
+
+
+def test_pop_slow_all():
+    sched = PollScheduler()
+    mod = PollModStub(6)
+    other = PollModStub(1)
+    sched.add_module(mod, 1001)
+    sched.add_module(other, 1001)
+    assert sched.pop_slow(1001)[1].__name__ == 'read_p0'
+    assert [(m, f.__name__) for m, f in sched.pop_slow_all(1001)] == [
+        (mod, 'read_p1'), (other, 'read_p0')]
+    assert sched.pop_slow(1001) is None
+    assert sorted(f.__name__ for _, f in sched.pop_slow_all(1010)) == [
+        'read_p2', 'read_p3', 'read_p4', 'read_p5']
+    assert sched.pop_slow(1010) is None
+
+
+def test_pop_slow_all_heap():
+    sched = PollScheduler()
+    mod = PollModStub(2, slowinterval=10)
+    other = PollModStub(1, pollinterval=3, slowinterval=3)
+    sched.add_module(mod, 1000)
+    sched.add_module(other, 1003)
+    # all due polls are skipped, as the parameters were updated recently
+    for pobj in mod.params:
+        pobj.timestamp = 1000
+    assert sched.pop_slow_all(1001) == []
+    assert mod.pollInfo.due['read_p0'] == 1010
+    heap = sched.slow
+    assert all(heap[i] >= heap[(i - 1) // 2] for i in range(1, len(heap)))
+    assert heap[0][0] == min(e[0] for e in heap) == 1002
+    assert sched.pop_slow(1002)[0] is other
+
+
+def test_no_spread():
+    sched = PollScheduler(spread=False)
+    mod = PollModStub(6)
+    sched.add_module(mod, 1001)
+    assert set(mod.pollInfo.due.values()) == {1001}
+
+
+class ABCMod(PoolMod):
+    a = Parameter('a', FloatRange(), default=0)
+    b = Parameter('b', FloatRange(), default=0)
+    c = Parameter('c', FloatRange(), default=0)
+    slowinterval = 0.2
+
+    def __init__(self, name, srv):
+        super().__init__(name, srv)
+        self.singles = []
+
+    def read_a(self):
+        self.singles.append('a')
+        return 0
+
+    def read_b(self):
+        self.singles.append('b')
+        return 0
+
+    def read_c(self):
+        self.singles.append('c')
+        return -1
+
+
+class BulkMod(ABCMod):
+    """a module without io, reading its parameters in bulk"""
+    def __init__(self, name, srv):
+        super().__init__(name, srv)
+        self.bulks = []
+
+    def bulkRead(self, requests):
+        self.bulks.append(sorted(pname for _, pname in requests))
+        return {(m, p): len(self.bulks) for m, p in requests if p != 'c'}
+
+
+def test_bulk_read():
+    srv = PoolServerStub(0)
+    mobj = BulkMod('bulk', srv)
+    mobj.initModule()
+    start_events = MultiEvent()
+    mobj.startModule(start_events)
+    assert start_events.wait(5)
+    # the first polls at startup are done by the read functions
+    assert sorted(mobj.singles) == ['a', 'b', 'c']
+    time.sleep(0.5)
+    assert mobj.bulks
+    assert mobj.bulks[0] == ['a', 'b', 'c']
+    assert mobj.a == mobj.b == len(mobj.bulks)
+    # c is not handled by bulkRead
+    assert mobj.singles.count('c') == len(mobj.bulks) + 1
+    assert mobj.singles.count('a') == 1
+
+
+class BulkIO:
+    """stub of an io reading the parameters of all its modules in one go"""
+    name = 'io'
+
+    def __init__(self):
+        self.triggerPoll = threading.Event()
+        self.bulks = []
+
+    def bulkRead(self, requests):
+        self.bulks.append(sorted((m.name, p) for m, p in requests))
+        return {(m, p): 5 for m, p in requests if p != 'c'}
+
+
+def test_bulk_read_io():
+    srv = PoolServerStub(0)
+    modules = [ABCMod(f'mod{i}', srv) for i in range(2)]
+    io = BulkIO()
+    poller = Poller(io, modules)
+    assert poller.setup(None)
+    time.sleep(0.3)
+    poller.poll()
+    # one call for the slow polls of all modules
+    assert io.bulks == [[(f'mod{i}', p) for i in range(2) for p in 'abc']]
+    for mobj in modules:
+        assert mobj.a == mobj.b == 5
+        assert mobj.singles == ['a', 'b', 'c', 'c']
@@ -0,0 +1,75 @@
+# *****************************************************************************
+#
+# This program is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+# *****************************************************************************
+
+import threading
+import time
+
+import pytest
+
+from frappy.lib.prioritylock import PriorityLock, high_priority, is_high_priority
+
+
+def test_reentrant():
+    lock = PriorityLock()
+    with lock:
+        with lock:
+            pass
+        assert lock.acquire(blocking=False)
+        lock.release()
+    with pytest.raises(RuntimeError):
+        lock.release()
+
+
+def test_high_priority_context():
+    assert not is_high_priority()
+    with high_priority():
+        assert is_high_priority()
+        with high_priority():
+            pass
+        assert is_high_priority()
+    assert not is_high_priority()
+
+
+def test_priority():
+    lock = PriorityLock()
+    order = []
+
+    def worker(name, high):
+        if high:
+            with high_priority(), lock:
+                order.append(name)
+        else:
+            with lock:
+                order.append(name)
+
+    with lock:
+        threads = []
+        for name, high in ('poll1', False), ('poll2', False), ('client', True):
+            thread = threading.Thread(target=worker, args=(name, high))
+            thread.start()
+            threads.append(thread)
+            time.sleep(0.02)  # make sure the thread is waiting
+        # another thread can not take the lock while it is held
+        thread = threading.Thread(target=lambda: order.append(lock.acquire(timeout=0.01)))
+        thread.start()
+        thread.join()
+    for thread in threads:
+        thread.join()
+    assert order[0] is False
+    assert order[1] == 'client'
+    assert sorted(order[2:]) == ['poll1', 'poll2']